@@ -0,0 +1,31 @@
+"""
+Settings for the benchmark suite: an in-memory SQLite database holding the
+synthetic models of ``benchapp``.  See run.py.
+"""
+SECRET_KEY = 'benchmarks'
+DEBUG = False
+TEMPLATE_DEBUG = False
+USE_TZ = False
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+INSTALLED_APPS = [
+    'crispy_forms',
+    'sheepdog_tables',
+    'benchapp',
+]
+
+ROOT_URLCONF = 'bench_urls'
+
+TEMPLATE_CONTEXT_PROCESSORS = ['django.core.context_processors.request']
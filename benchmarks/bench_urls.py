@@ -0,0 +1,17 @@
+from django.conf.urls import patterns, url
+from django.http import HttpResponse
+
+from benchapp.tables import ItemView
+
+
+def detail(request, pk):
+    return HttpResponse(pk)
+
+
+urlpatterns = patterns(
+    '',
+    url(r'^items/$', ItemView.as_view(), name='bench-items'),
+    url(r'^items/csv/$', ItemView.as_csv(), name='bench-items-csv'),
+    url(r'^items/(\d+)/$', detail, name='bench-item'),
+    url(r'^authors/(\d+)/$', detail, name='bench-author'),
+)
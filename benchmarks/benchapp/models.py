@@ -0,0 +1,30 @@
+from django.db import models
+
+
+class Author(models.Model):
+    name = models.CharField(max_length=100)
+    email = models.CharField(max_length=100)
+
+    def __unicode__(self):
+        return self.name
+
+    def initials(self):
+        return ''.join(part[:1] for part in self.name.split())
+
+
+class Item(models.Model):
+    STATUSES = (
+        ('draft', 'Draft'),
+        ('live', 'Live'),
+        ('archived', 'Archived'),
+    )
+
+    author = models.ForeignKey(Author, related_name='items')
+    title = models.CharField(max_length=200)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.IntegerField()
+    created = models.DateTimeField(db_index=True)
+    status = models.CharField(max_length=10, choices=STATUSES)
+
+    def __unicode__(self):
+        return self.title
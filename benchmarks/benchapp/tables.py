@@ -0,0 +1,41 @@
+from django.views.generic import ListView
+
+from sheepdog_tables import TablesMixin, Table, Column, ColumnURL
+
+from .models import Item
+
+
+class ItemURL(ColumnURL):
+    url = 'bench-item'
+    args = ['pk']
+
+
+class AuthorURL(ColumnURL):
+    url = 'bench-author'
+    args = ['author.pk']
+    attrs = {'class': 'author'}
+
+
+class ItemTable(Table):
+    """
+    A typical table: a linked title, a linked foreign key chain, a method
+    call through the foreign key and plain fields, some of them sortable.
+    """
+    table_sequence = ['title', 'author', 'initials', 'price', 'quantity',
+                      'created', 'status']
+    table_page_limit = 50
+
+    title = Column(sortable=True, url_class=ItemURL)
+    author = Column(accessor='author__name', url_class=AuthorURL)
+    initials = Column(accessor='author.initials')
+    price = Column(sortable=True)
+    quantity = Column()
+    created = Column(accessor='created.date', sortable=True,
+                     sort_field='created')
+    status = Column(accessor='get_status_display')
+
+
+class ItemView(TablesMixin, ListView):
+    template_name = 'benchapp/page.html'
+    queryset = Item.objects.order_by('pk')
+    main_table = ItemTable()
@@ -0,0 +1,145 @@
+"""
+Benchmarks of the table hot paths: per-cell column values, column
+generation, sorting, pagination, CSV rows and the template tags, plus whole
+page renders and CSV exports against an in-memory SQLite database of
+synthetic, deterministic data at each of the given sizes.
+
+Run from the repository root, with Django and the app's requirements
+installed:
+
+    python benchmarks/run.py [--rows 1000,100000,1000000] [--only NAME]
+                             [--json results.json]
+                             [--compare baseline.json] [--threshold 0.1]
+
+Results are printed as a table, and written as JSON with ``--json``.  Save
+one run's JSON as the baseline and pass it to ``--compare`` on the next to
+see the change of every result; the exit status is 1 when any of them got
+slower by more than ``--threshold`` (a fraction).  Timings are only
+comparable between runs on the same machine and interpreter.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(HERE, os.pardir), HERE]
+os.environ['DJANGO_SETTINGS_MODULE'] = 'bench_settings'
+
+import django
+
+import suite
+
+
+def run(sizes, only=None, out=sys.stdout):
+    suite.setup_database()
+    selected = [(name, sized, func) for name, sized, func in suite.BENCHMARKS
+                if not only or any(name.startswith(o) for o in only)]
+
+    results = []
+    for name, sized, func in selected:
+        if not sized:
+            out.write('running %s\n' % name)
+            results.extend(func())
+
+    sized = [b for b in selected if b[1]]
+    for rows in sizes if sized else ():
+        out.write('populating %s rows\n' % rows)
+        suite.populate(rows)
+        for name, _, func in sized:
+            out.write('running %s at %s rows\n' % (name, rows))
+            results.extend(func(rows))
+    return results
+
+
+def key(result):
+    return result['name'], result['rows']
+
+
+def label(result):
+    if result['rows'] is None:
+        return result['name']
+    return '%s@%s' % key(result)
+
+
+def compare(results, baseline, threshold):
+    """
+    Adds the ``baseline`` value and ``change`` (a ratio, > 1 being slower) to
+    every result that has a counterpart in the baseline, and returns the
+    results that got slower by more than ``threshold``.
+    """
+    previous = dict((key(r), r) for r in baseline['results'])
+    regressions = []
+    for r in results:
+        old = previous.get(key(r))
+        if old is None or not old['value']:
+            continue
+        r['baseline'] = old['value']
+        r['change'] = r['value'] / old['value']
+        if r['change'] > 1 + threshold:
+            regressions.append(r)
+    return regressions
+
+
+def report(results, out=sys.stdout):
+    out.write('\n%-32s %9s %12s %-10s %9s %8s %8s\n' % (
+        'benchmark', 'rows', 'value', 'unit', 'peak KB', 'queries',
+        'change'))
+    for r in results:
+        change = r.get('change')
+        out.write('%-32s %9s %12.3f %-10s %9s %8s %8s\n' % (
+            r['name'], r['rows'] if r['rows'] is not None else '-',
+            r['value'], r['unit'],
+            r['peak_kb'] if r.get('peak_kb') is not None else '-',
+            r['queries'] if r.get('queries') is not None else '-',
+            '%+.1f%%' % ((change - 1) * 100) if change is not None else ''))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', default='1000,100000,1000000',
+                        help='comma separated database sizes')
+    parser.add_argument('--only', action='append',
+                        help='run the benchmarks starting with this name')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='a previous --json file')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='the slowdown reported as a regression')
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.rows.split(',') if s]
+    results = run(sizes, args.only)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+    report(results)
+
+    if args.json:
+        data = {
+            'meta': {
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'implementation': platform.python_implementation(),
+                'django': django.get_version(),
+                'machine': platform.machine(),
+                'rows': sizes,
+            },
+            'results': results,
+        }
+        with open(args.json, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+
+    if regressions:
+        sys.stdout.write('\n%s regressions over %.0f%%: %s\n' % (
+            len(regressions), args.threshold * 100,
+            ', '.join(label(r) for r in regressions)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
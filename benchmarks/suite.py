@@ -0,0 +1,370 @@
+"""
+The benchmarks run by run.py, and the deterministic data they run against.
+
+Each benchmark is a function registered with ``@benchmark``.  Micro
+benchmarks take no arguments and are run once; sized ones take the number
+of rows in the database and are run for every size.  Both return a list of
+result dicts:
+
+    {'name': 'column.value.chain', 'rows': None, 'value': 212.4,
+     'unit': 'ns/cell'}
+
+optionally with the ``peak_kb`` of memory, the number of ``queries`` or
+the ``speedup`` over a legacy implementation.
+"""
+import datetime
+import gc
+import os
+import random
+import struct
+import sys
+import time
+import traceback
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.template import Context, Template
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from sheepdog_tables import Column, DictColumn
+from sheepdog_tables.paginator import NamespacedPaginator
+
+from benchapp.models import Author, Item
+from benchapp.tables import ItemTable, ItemView
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SEED = 20131021
+BASE_DATE = datetime.datetime(2013, 10, 21)
+WORDS = ['table', 'column', 'sort', 'page', 'export', 'filter', 'render',
+         'query', 'row', 'cell', 'header', 'footer']
+
+BENCHMARKS = []
+
+
+def benchmark(name, sized=False):
+    def register(func):
+        BENCHMARKS.append((name, sized, func))
+        return func
+    return register
+
+
+def result(name, value, unit, rows=None, **extra):
+    data = {'name': name, 'rows': rows, 'value': value, 'unit': unit}
+    data.update(extra)
+    return data
+
+
+def measure(func, min_time=0.2, repeat=3, number=None):
+    """
+    The best time in seconds of one call of ``func``, out of ``repeat``
+    runs of ``number`` calls.  ``number`` defaults to enough calls for a
+    run to take ``min_time``.
+    """
+    if number is None:
+        number = 1
+        while True:
+            start = time.time()
+            for _ in range(number):
+                func()
+            if time.time() - start >= min_time:
+                break
+            number *= 2
+
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.time()
+        for _ in range(number):
+            func()
+        elapsed = (time.time() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def max_rss():
+    """The peak resident size of this process in KB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KB elsewhere
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def peak_memory(func):
+    """
+    Runs ``func`` once in a forked child and returns how far it raised the
+    child's peak resident size, in KB.  A fresh child starts with its peak
+    at the parent's current size, so earlier benchmarks and sizes don't
+    hide what this one allocates, and the number means the same on every
+    interpreter.  ``None`` where fork or getrusage isn't available.
+    """
+    if resource is None or not hasattr(os, 'fork'):
+        return None
+    gc.collect()
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read)
+        code = 1
+        try:
+            before = max_rss()
+            func()
+            os.write(write, struct.pack('q', max_rss() - before))
+            code = 0
+        except Exception:
+            traceback.print_exc()
+        finally:
+            os._exit(code)
+    os.close(write)
+    try:
+        data = os.read(read, 8)
+    finally:
+        os.close(read)
+        os.waitpid(pid, 0)
+    if len(data) != 8:
+        return None
+    return struct.unpack('q', data)[0]
+
+
+def setup_database():
+    call_command('syncdb', interactive=False, verbosity=0)
+
+
+def populate(rows, seed=SEED):
+    """
+    Fill the database with ``rows`` items (and one author per ten items),
+    generated from ``seed`` so every run sees the same data.
+    """
+    rng = random.Random(seed)
+    authors = max(rows // 10, 1)
+    cursor = connection.cursor()
+    with transaction.atomic():
+        # raw deletes, as the ORM would collect a million items first
+        cursor.execute('DELETE FROM benchapp_item')
+        cursor.execute('DELETE FROM benchapp_author')
+        cursor.executemany(
+            'INSERT INTO benchapp_author (id, name, email) '
+            'VALUES (%s, %s, %s)',
+            [(i, 'Author %s %s' % (rng.choice(WORDS).title(), i),
+              'author%s@example.com' % i) for i in range(1, authors + 1)])
+
+        statuses = [s for s, _ in Item.STATUSES]
+        batch = []
+        for i in range(1, rows + 1):
+            batch.append((
+                i, rng.randint(1, authors),
+                ' '.join(rng.choice(WORDS) for _ in range(4)),
+                Decimal(rng.randint(100, 100000)) / 100,
+                rng.randint(0, 1000),
+                BASE_DATE + datetime.timedelta(
+                    seconds=rng.randint(0, 10 ** 8)),
+                rng.choice(statuses)))
+            if len(batch) == 10000:
+                insert_items(cursor, batch)
+                batch = []
+        if batch:
+            insert_items(cursor, batch)
+
+
+def insert_items(cursor, batch):
+    cursor.executemany(
+        'INSERT INTO benchapp_item '
+        '(id, author_id, title, price, quantity, created, status) '
+        'VALUES (%s, %s, %s, %s, %s, %s, %s)', batch)
+
+
+def sample_item():
+    author = Author(pk=7, name='Author Table 7', email='author7@example.com')
+    return Item(pk=42, author=author, title='table column sort page',
+                price=Decimal('12.50'), quantity=3,
+                created=BASE_DATE, status='live')
+
+
+def legacy_value(col, object):
+    """
+    ``Column.value`` as it was before accessors were compiled, re-parsing
+    the accessor chain on every call.
+    """
+    if col.accessor is None and '__' not in col.field:
+        object = getattr(object, col.field)
+    elif hasattr(col.accessor, '__call__'):
+        object = col.accessor(object)
+    else:
+        chain = col.accessor or col.field
+        arg = chain.replace('__', '.').split('.')
+        for a in arg:
+            if object is None:
+                return col.default
+            fn = getattr(object, a)
+            object = fn() if callable(fn) else fn
+    return object or col.default
+
+
+def legacy_dict_value(col, d):
+    """``DictColumn.value`` before accessors were compiled."""
+    if col.accessor is None and '__' not in col.field:
+        d = d.get(col.field, None)
+    elif hasattr(col.accessor, '__call__'):
+        d = col.accessor(d)
+    else:
+        chain = col.accessor or col.field
+        arg = chain.replace('__', '.').split('.')
+        for a in arg:
+            if d is None:
+                return col.default
+            fn = d.get(a, None)
+            d = fn() if callable(fn) else fn
+    return d or col.default
+
+
+class Participant(object):
+    full_name = 'Jane Doe'
+
+    def initials(self):
+        return 'JD'
+
+
+class Row(object):
+    """A plain object, for column values without model descriptors."""
+    title = 'Row title'
+    participant = Participant()
+
+
+def make_column(cls, **kwargs):
+    col = cls(**kwargs)
+    col.field = col.field or 'title'
+    col.compile_accessor()
+    return col
+
+
+# (result name, column class, object, column arguments), covering each kind
+# of accessor on plain objects and dicts.
+COLUMN_CASES = [
+    ('column.value.plain', Column, Row(), {}),
+    ('column.value.dunder_chain', Column, Row(),
+     {'accessor': 'participant__full_name'}),
+    ('column.value.dotted_call', Column, Row(),
+     {'accessor': 'participant.initials'}),
+    ('column.value.callable', Column, Row(),
+     {'accessor': lambda o: o.title}),
+    ('dictcolumn.value.field', DictColumn, {'title': 'Row title'}, {}),
+    ('dictcolumn.value.chain', DictColumn,
+     {'participant': {'full_name': 'Jane Doe'}},
+     {'accessor': 'participant.full_name'}),
+]
+
+
+@benchmark('column.value')
+def column_value():
+    """
+    The per-cell cost of each case, compiled (``column.value.*``) and with
+    the legacy resolvers (``*.legacy``), which must give the same values.
+    """
+    table = ItemTable()
+    obj = sample_item()
+    cases = [('column.value.%s' % key, table.table_columns[key], obj)
+             for key in ['title', 'author', 'initials', 'created', 'status']]
+    cases.extend((name, make_column(cls, **kwargs), row)
+                 for name, cls, row, kwargs in COLUMN_CASES)
+
+    results = []
+    for name, col, row in cases:
+        legacy = (legacy_dict_value if isinstance(col, DictColumn)
+                  else legacy_value)
+        assert legacy(col, row) == col.value(row), name
+        before = measure(lambda: legacy(col, row))
+        after = measure(lambda: col.value(row))
+        results.append(result(name, after * 1e9, 'ns/cell',
+                              speedup=before / after))
+        results.append(result(name + '.legacy', before * 1e9, 'ns/cell'))
+    return results
+
+
+@benchmark('table.gen_columns')
+def gen_columns():
+    table = ItemTable()
+    seconds = measure(table.gen_columns)
+    return [result('table.gen_columns', seconds * 1e6, 'us/call')]
+
+
+@benchmark('table.sort')
+def table_sort():
+    table = ItemTable()
+    queryset = Item.objects.all()
+    seconds = measure(lambda: table.sort(queryset, '-price'))
+    return [result('table.sort', seconds * 1e6, 'us/call')]
+
+
+@benchmark('paginator.pages')
+def paginator_pages():
+    def pages():
+        paginator = NamespacedPaginator(
+            [], 50, namespace='main_table', current_page=500,
+            count_function=lambda object_list: 100000)
+        return paginator.pages()
+    seconds = measure(pages)
+    return [result('paginator.pages', seconds * 1e6, 'us/call')]
+
+
+@benchmark('export.prepare_obj_for_csv')
+def prepare_obj_for_csv():
+    view = ItemView()
+    table = view.main_table
+    obj = sample_item()
+    seconds = measure(lambda: view.prepare_obj_for_csv(table, obj))
+    return [result('export.prepare_obj_for_csv', seconds * 1e6, 'us/row')]
+
+
+@benchmark('templatetags')
+def templatetags():
+    table = ItemTable()
+    col = table.table_columns['author']
+    context = Context({'col': col, 'obj': sample_item(),
+                       'url': col.get_url(), 'attrs': {'class': 'author'}})
+    templates = [
+        ('call', '{% load call %}{% call col value obj %}'),
+        ('urlbuilder', '{% load urlbuilder %}{% urlbuilder url obj %}'),
+        ('get', '{% load get %}{{ attrs|get:"class" }}'),
+    ]
+    results = []
+    for name, source in templates:
+        template = Template(source)
+        seconds = measure(lambda: template.render(context))
+        results.append(result('templatetags.%s' % name, seconds * 1e6,
+                              'us/render'))
+    return results
+
+
+@benchmark('page.render', sized=True)
+def page_render(rows):
+    view = ItemView.as_view()
+    page = max(rows // ItemTable.table_page_limit // 2, 1)
+    request = RequestFactory().get(
+        '/items/', {'main_table-page': page, 'main_table-sort': '-price'})
+
+    def render():
+        return view(request).render()
+
+    with CaptureQueriesContext(connection) as queries:
+        render()
+    seconds = measure(render, min_time=0.5)
+    return [result('page.render', seconds * 1e3, 'ms/page', rows,
+                   queries=len(queries), peak_kb=peak_memory(render))]
+
+
+@benchmark('export.csv', sized=True)
+def export_csv(rows):
+    view = ItemView.as_csv(csv_streaming=True)
+    request = RequestFactory().get('/items/csv/')
+
+    def export():
+        for _ in view(request).streaming_content:
+            pass
+
+    seconds = measure(export, number=1, repeat=1 if rows > 100000 else 3)
+    return [result('export.csv', seconds / rows * 1e6, 'us/row', rows,
+                   peak_kb=peak_memory(export))]
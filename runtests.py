@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+"""
+Run the test suite against an in-memory SQLite database:
+
+    python runtests.py [tests.test_cache ...]
+"""
+import os
+import sys
+
+os.environ['DJANGO_SETTINGS_MODULE'] = 'tests.settings'
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from django.test.runner import DiscoverRunner
+
+
+def main(labels):
+    runner = DiscoverRunner(verbosity=1)
+    failures = runner.run_tests(labels or ['tests'])
+    sys.exit(bool(failures))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
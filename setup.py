@@ -15,7 +15,7 @@ setup(
     license = "BSD",
     keywords = "tables",
     url = "https://github.com/SheepDogInc/sheepdog_tables",
-    packages=find_packages(),
+    packages=find_packages(exclude=['tests', 'tests.*']),
     long_description=readme,
     include_package_data=True,
     classifiers=
@@ -0,0 +1,107 @@
+import hashlib
+import logging
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import Max
+from django.db.models.signals import post_save, post_delete
+from django.utils.encoding import force_bytes
+
+logger = logging.getLogger("sheepdog_tables")
+
+_stats = defaultdict(lambda: defaultdict(int))
+
+
+def record(name, kind, hit):
+    """
+    Count a cache hit or miss of ``kind`` ('page', 'html' or 'export') for
+    the table class ``name``.
+    """
+    _stats[name]['%s_%s' % (kind, 'hits' if hit else 'misses')] += 1
+    logger.debug('table cache %s for %s %s',
+                 'hit' if hit else 'miss', name, kind)
+
+
+def get_stats():
+    """
+    Returns the hits and misses recorded by this process, per table class:
+
+        {'MyTable': {'page_hits': 10, 'page_misses': 2, ...}}
+    """
+    return dict((name, dict(counts)) for name, counts in _stats.items())
+
+
+def reset_stats():
+    _stats.clear()
+
+
+def version_key(model):
+    # proxies and deferred (only/defer) classes share their model's version
+    return 'sheepdog_tables:version:%s' % model._meta.concrete_model._meta
+
+
+def model_version(model):
+    """
+    The default data version of a table: a counter per model that is bumped
+    whenever one of its instances is saved or deleted.
+    """
+    watch()
+    key = version_key(model)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock rather than 1, so a counter that has been
+        # evicted never comes back with a version already used.
+        version = int(time.time() * 1000)
+        cache.add(key, version, None)
+        version = cache.get(key, version)
+    return version
+
+
+def bump_version(model):
+    key = version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), None)
+
+
+def _bump_sender(sender, **kwargs):
+    # Models without a version have nothing cached against one yet.
+    try:
+        cache.incr(version_key(sender))
+    except ValueError:
+        pass
+
+
+def watch():
+    """
+    Connect the receivers that bump a model's version whenever one of its
+    instances is saved or deleted.  They cost a cache round trip per save,
+    so they're only connected once a process defines a table class with
+    ``table_cache_timeout``, or uses a data version, or at app load when
+    the ``SHEEPDOG_TABLES_CACHE_VERSIONS`` setting is on.  Turn the setting
+    on when rows are saved by processes that never import the tables, such
+    as management commands or task workers.
+    """
+    post_save.connect(_bump_sender, weak=False,
+                      dispatch_uid='sheepdog_tables_versions')
+    post_delete.connect(_bump_sender, weak=False,
+                        dispatch_uid='sheepdog_tables_versions')
+
+
+def latest_version(queryset, field='updated_at'):
+    """
+    A data version built from the latest value of ``field`` across the
+    queryset's model, e.g. a last modified timestamp.  For use in
+    ``Table.get_cache_version``.
+    """
+    latest = queryset.model._default_manager.aggregate(
+        latest=Max(field))['latest']
+    return latest.isoformat() if hasattr(latest, 'isoformat') else latest
+
+
+def make_key(*parts):
+    data = b':'.join(force_bytes(p) for p in parts)
+    digest = hashlib.md5(data).hexdigest()
+    return 'sheepdog_tables:table:%s' % digest
@@ -1,6 +1,61 @@
+from operator import attrgetter
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models.aggregates import Aggregate
+from django.utils import six
+
 ASC = 'asc'
 DESC = 'desc'
 
+# What a column's footer aggregate covers
+TOTAL = 'total'
+PAGE = 'page'
+BOTH = 'both'
+
+
+def split_chain(chain):
+    """
+    Split an accessor chain written with either dot or double underscore
+    notation into its individual lookups.
+    """
+    return chain.replace('__', '.').split('.')
+
+
+def _attr_lookup(obj, name):
+    return getattr(obj, name)
+
+
+def _dict_lookup(d, name):
+    return d.get(name, None)
+
+
+def compile_chain(names, lookup):
+    """
+    Build a resolver walking ``names`` with ``lookup``.  Callables found along
+    the way are called, and a None anywhere before the end of the chain
+    short-circuits the walk.
+    """
+    if len(names) == 1:
+        name = names[0]
+
+        def resolve(obj):
+            if obj is None:
+                return None
+            obj = lookup(obj, name)
+            return obj() if callable(obj) else obj
+        return resolve
+
+    def resolve(obj):
+        for name in names:
+            if obj is None:
+                return None
+            obj = lookup(obj, name)
+            if callable(obj):
+                obj = obj()
+        return obj
+    return resolve
+
+
 class ColumnURL(object):
     """
     Represents the url a column's data should point to.
@@ -35,6 +90,12 @@ class Column(object):
 
     csv_value -- Return the value to write to a csv file
 
+    export_value -- Return the value for the typed export formats (see
+                export.py), which is the resolved value as is: empty values
+                such as ``0`` or ``None`` aren't replaced by ``default``.
+                Override it to format typed exports; a subclass that only
+                overrides ``csv_value`` gets that in every format instead.
+
     field - The field to use for this column
 
     header - What to display in the <th></th> tag
@@ -75,11 +136,54 @@ class Column(object):
     sort_field - An optional field to pass that should map directly to the
             field name that the django ORM expects, if you're making use of
             some special case accessor to do rendering.
+
+    related - Overrides the related lookups the table infers for this column
+            from its field, accessor and url args.  ``None`` (the default)
+            infers them, ``False`` disables them for this column, and a list
+            of lookups such as ``['participant', 'tags']`` is used as given,
+            which is handy for callable accessors.
+
+    depends - A list of the lookups (e.g. ``['first_name', 'user__email']``)
+            a callable accessor, property or method reads.  Used in place of
+            the accessor chain when working out which related objects and
+            fields a table needs to fetch.
+
+    annotation_filters - Whether the annotation may change which rows the
+            queryset returns (by filtering or joining, for instance), which
+            is assumed by default.  Set it to False for annotations that
+            only add values, so tables count their rows without them.
+
+    page_annotation - Compute the annotation for the rows of the current page
+            only, rather than as part of the paged query.  The values are
+            read back by the names the column accesses, so the column can't
+            be sortable.
+
+    aggregate - An aggregate to show in the table's footer, computed by the
+            database.  Either an aggregate class such as ``Sum``, ``Avg``,
+            ``Min`` or ``Max``, applied to the column's sort field, or an
+            aggregate instance used as given, e.g.
+            ``Count('participant', distinct=True)``.  Override
+            ``footer_value`` to format the result.
+
+    aggregate_scope - Whether the aggregate covers the whole filtered
+            queryset (``'total'``), the current page (``'page'``) or
+            ``'both'``, in a footer row each.
+
+    batch - A callable taking a list of objects (the current page, or a
+            chunk of an export) and returning the column's value for each
+            of them, in order.  Values that would take a query per row can
+            then be fetched with one grouped query per page.  The values
+            are stored on the objects under a private name (see
+            ``batch_key``), where ``value`` reads them, so the column can't
+            have an accessor.  Declare the fields the callable reads with
+            ``depends``.
     """
     def __init__(self, field=None, header=None, accessor=None,
                  annotation=None, default=None, css_class=None,
                  url_class=None, editable=False, sortable=False,
-                 sort_field=None):
+                 sort_field=None, related=None, depends=None,
+                 annotation_filters=True, page_annotation=False,
+                 aggregate=None, aggregate_scope=TOTAL, batch=None):
         self.field = field
         self.header = header
         self.accessor = accessor
@@ -91,33 +195,140 @@ class Column(object):
         self.editable = editable
         self.sortable = sortable
         self.sort_field = sort_field
+        self.related = related
+        self.depends = depends
+        self.annotation_filters = annotation_filters
+        self.page_annotation = page_annotation
+        self.aggregate = aggregate
+        self.aggregate_scope = aggregate_scope
+        self.batch = batch
+        if page_annotation and sortable:
+            raise ImproperlyConfigured(
+                "Columns with a page_annotation can't be sortable.")
+        if aggregate_scope not in (TOTAL, PAGE, BOTH):
+            raise ImproperlyConfigured(
+                "aggregate_scope must be one of '%s', '%s' or '%s'."
+                % (TOTAL, PAGE, BOTH))
+        if batch is not None and accessor is not None:
+            raise ImproperlyConfigured(
+                "Columns with a batch can't have an accessor.")
+        self._resolver = None
+        self._url = None
+        self._csv_override = (six.get_unbound_function(type(self).csv_value)
+                              is not six.get_unbound_function(
+                                  Column.csv_value))
 
     def is_linked(self):
         return self.url_class is not None
 
     def get_url(self, request=None):
-        return self.url_class()
+        if self._url is None:
+            self._url = self.url_class()
+        return self._url
 
     def csv_value(self, object):
         return Column.value(self, object)
 
-    def value(self, object):
-        if self.accessor is None and '__' not in self.field:
+    def export_value(self, object):
+        if self._csv_override:
+            return self.csv_value(object)
+        resolver = self._resolver or self.compile_accessor()
+        return resolver(object)
+
+    def compile_accessor(self):
+        """
+        Compile the field / accessor into the resolver used by ``value``, so
+        the accessor chain is parsed once per column instead of once per
+        cell.  This is called when the column is bound to its table, and
+        lazily on first use otherwise.
+        """
+        if self.batch is not None:
+            # values stored by resolve_batch
+            key = self.batch_key()
+            self._resolver = lambda obj: getattr(obj, key, None)
+        elif self.accessor is None and '__' not in self.field:
             # accessor is just a plain field
-            object = getattr(object, self.field)
+            if '.' in self.field:
+                field = self.field
+                self._resolver = lambda obj: getattr(obj, field)
+            else:
+                self._resolver = attrgetter(self.field)
         elif hasattr(self.accessor, '__call__'):
             # accessor can be a callable
-            object = self.accessor(object)
+            self._resolver = self.accessor
         else:
             # accessor is some crazy dot or underscore notation
-            chain = self.accessor or self.field
-            arg = chain.replace('__', '.').split('.')
-            for a in arg:
-                if object is None:
-                    return self.default
-                fn = getattr(object, a)
-                object = fn() if callable(fn) else fn
-        return object or self.default
+            self._resolver = compile_chain(
+                split_chain(self.accessor or self.field), _attr_lookup)
+        return self._resolver
+
+    def accessor_chains(self):
+        """
+        The attribute chains this column reads off each object for its
+        value.  Callable accessors and batches are opaque, so they only
+        contribute the chains they declare in ``depends``.
+        """
+        if self.depends is not None:
+            return [split_chain(d) for d in self.depends]
+        elif self.batch is None and not hasattr(self.accessor, '__call__'):
+            return [split_chain(self.accessor or self.field)]
+        return []
+
+    def url_chains(self):
+        """
+        The attribute chains this column's url arguments read off each
+        object.
+        """
+        if self.url_class is None:
+            return []
+        return [split_chain(arg) for arg in self.url_class.args]
+
+    def value(self, object):
+        resolver = self._resolver or self.compile_accessor()
+        return resolver(object) or self.default
+
+    def aggregates_in(self, scope):
+        return (self.aggregate is not None and
+                self.aggregate_scope in (scope, BOTH))
+
+    def get_aggregate(self):
+        """
+        The aggregate expression of the column's footer.
+        """
+        if isinstance(self.aggregate, Aggregate):
+            return self.aggregate
+        field = self.get_sort_field()
+        if hasattr(field, '__call__'):
+            raise ImproperlyConfigured(
+                "Columns with a callable accessor need a sort_field or an "
+                "aggregate instance to aggregate.")
+        return self.aggregate('__'.join(split_chain(field)))
+
+    def footer_value(self, value):
+        return self.default if value is None else value
+
+    def resolve_batch(self, objects):
+        """
+        Compute the values of ``objects`` (a list) with the column's
+        ``batch`` and store them on each object for ``value`` to read.
+        """
+        key = self.batch_key()
+        for obj, value in zip(objects, self.get_batch_values(objects)):
+            setattr(obj, key, value)
+
+    def batch_key(self):
+        # private, so batches can't clash with the objects' own attributes
+        # (properties, or model fields an edit table would save)
+        return '_batch_%s' % self.field
+
+    def get_batch_values(self, objects):
+        values = list(self.batch(objects))
+        if len(values) != len(objects):
+            # not a ValueError, which templates would swallow
+            raise ImproperlyConfigured(
+                'The batch of column %r returned %s values for %s objects.'
+                % (self.field, len(values), len(objects)))
+        return values
 
     def get_sort_field(self):
         return self.sort_field or self.accessor or self.field
@@ -137,25 +348,31 @@ class DictColumn(Column):
     """
     Dict Column for tables based off REST objects and other dictionaries.
 
-    This is meant to be used in conjunction with MockQuerySet found in utils.py
+    This is meant to be used in conjunction with MockQuerySet or, for sortable
+    and filterable tables, ColumnarQuerySet found in utils.py
     """
-    def value(self, d):
-        if self.accessor is None and '__' not in self.field:
+    def compile_accessor(self):
+        if self.batch is not None:
+            # values stored by resolve_batch
+            key = self.batch_key()
+            self._resolver = lambda d: d.get(key, None)
+        elif self.accessor is None and '__' not in self.field:
             # accessor is just a plain field
-            d = d.get(self.field, None)
+            field = self.field
+            self._resolver = lambda d: d.get(field, None)
         elif hasattr(self.accessor, '__call__'):
             # accessor can be a callable
-            d = self.accessor(d)
+            self._resolver = self.accessor
         else:
             # accessor is some crazy dot or underscore notation
-            chain = self.accessor or self.field
-            arg = chain.replace('__', '.').split('.')
-            for a in arg:
-                if d is None:
-                    return self.default
-                fn = d.get(a, None)
-                d = fn() if callable(fn) else fn
-        return d or self.default
+            self._resolver = compile_chain(
+                split_chain(self.accessor or self.field), _dict_lookup)
+        return self._resolver
+
+    def resolve_batch(self, objects):
+        key = self.batch_key()
+        for obj, value in zip(objects, self.get_batch_values(objects)):
+            obj[key] = value
 
 
 class FieldColumn(Column):
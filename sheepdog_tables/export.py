@@ -0,0 +1,359 @@
+import csv
+import datetime
+import json
+import tempfile
+import zlib
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import six
+from django.utils.encoding import force_text
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+_exporters = {}
+
+NATIVE_TYPES = six.integer_types + (bool, float, Decimal, datetime.date,
+                                    datetime.time)
+
+
+class CSVBuffer(object):
+    """
+    File-like target for ``csv.writer`` that holds on to what has been
+    written until it is flushed, so CSV rows can be handed out in batches
+    by a streaming response.
+    """
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(data)
+
+    def flush(self):
+        data = ''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def gzip_stream(chunks, level=6):
+    """
+    Compress an iterable of byte strings into a gzip stream on the fly.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def accepts_gzip(header):
+    """
+    Whether an ``Accept-Encoding`` header allows a gzip response: gzip (or
+    ``*`` when gzip isn't listed) must be there with a nonzero quality, so
+    ``gzip;q=0`` turns it off.
+    """
+    qualities = {}
+    for coding in header.split(','):
+        params = coding.split(';')
+        name = params[0].strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params[1:]:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name] = quality
+    for name in ('gzip', 'x-gzip', '*'):
+        if name in qualities:
+            return qualities[name] > 0
+    return False
+
+
+class RowsJSONEncoder(DjangoJSONEncoder):
+    """
+    JSON encoder for table rows, which falls back on the text of values
+    JSON has no type for, such as model instances.
+    """
+    def default(self, o):
+        try:
+            return super(RowsJSONEncoder, self).default(o)
+        except TypeError:
+            return force_text(o)
+
+
+def native_value(value):
+    """
+    ``value`` as a type the typed exporters can store as is: numbers, dates,
+    times and booleans are kept, anything else becomes text.
+    """
+    if value is None or isinstance(value, NATIVE_TYPES):
+        return value
+    return force_text(value)
+
+
+def register_exporter(cls):
+    """
+    Offer the exporter class ``cls`` under its ``format``, replacing any
+    exporter already registered for it.  Can be used as a class decorator.
+    """
+    _exporters[cls.format] = cls
+    return cls
+
+
+def get_exporter(format):
+    """
+    The exporter class registered for ``format``, or ``None``.
+    """
+    return _exporters.get(format)
+
+
+def get_formats():
+    """
+    The formats that can be exported with the libraries installed.
+    """
+    return sorted(f for f, cls in _exporters.items() if cls.available)
+
+
+class Exporter(object):
+    """
+    Base class of the exporters, which turn a table's rows into a file a
+    chunk of rows at a time.
+
+    :params
+
+    headers - The column headers.
+
+    names - The column keys (``table_sequence``), for formats naming their
+            fields.
+
+    fields - The model field behind each column, or ``None`` where there
+            isn't one (see ``Table.export_fields``), for formats typing
+            their columns.
+
+    Subclasses set:
+
+    format - The name the exporter is registered and requested under.
+
+    extension, content_type - Of the files it writes.
+
+    encoded - Whether rows are prepared with ``prepare_obj_for_csv``, as
+            utf-8 byte strings, rather than with ``prepare_obj_for_export``,
+            which keeps the columns' own types.
+
+    compressible - Whether it is worth gzipping on the fly.
+
+    available - Whether the libraries it needs are installed.
+    """
+    format = None
+    extension = None
+    content_type = 'application/octet-stream'
+    encoded = False
+    compressible = True
+    available = True
+
+    def __init__(self, headers, names, fields=None):
+        self.headers = headers
+        self.names = names
+        self.fields = fields or [None] * len(names)
+
+    def stream(self, chunks):
+        """
+        Yields the file in pieces, one per chunk of rows.
+        """
+        yield self.begin()
+        for rows in chunks:
+            yield self.write_rows(rows)
+        yield self.end()
+
+    def write(self, f, chunks):
+        """
+        Writes the file to the open file ``f``.
+        """
+        for data in self.stream(chunks):
+            f.write(data)
+
+    def begin(self):
+        return b''
+
+    def write_rows(self, rows):
+        raise NotImplementedError
+
+    def end(self):
+        return b''
+
+
+@register_exporter
+class CSVExporter(Exporter):
+    format = 'csv'
+    extension = '.csv'
+    content_type = 'text/csv'
+    encoded = True
+    dialect = 'excel'
+
+    def __init__(self, headers, names, fields=None):
+        super(CSVExporter, self).__init__(headers, names, fields)
+        self.buf = CSVBuffer()
+        self.writer = csv.writer(self.buf, dialect=self.dialect)
+
+    def begin(self):
+        self.writer.writerow(self.headers)
+        return self.buf.flush()
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.writer.writerow(row)
+        return self.buf.flush()
+
+
+@register_exporter
+class TSVExporter(CSVExporter):
+    format = 'tsv'
+    extension = '.tsv'
+    content_type = 'text/tab-separated-values'
+    dialect = 'excel-tab'
+
+
+@register_exporter
+class JSONLinesExporter(Exporter):
+    """
+    One JSON object per row, keyed by column name.
+    """
+    format = 'jsonl'
+    extension = '.jsonl'
+    content_type = 'application/x-ndjson'
+
+    def write_rows(self, rows):
+        names = self.names
+        return b''.join(
+            json.dumps(dict(zip(names, row)), cls=RowsJSONEncoder) + '\n'
+            for row in rows)
+
+
+class FileExporter(Exporter):
+    """
+    Base class of the exporters of container formats, which can't be handed
+    out until they are complete.  They are written to a temporary file,
+    then streamed from it.
+    """
+    compressible = False
+    block_size = 64 * 1024
+
+    def stream(self, chunks):
+        with tempfile.TemporaryFile() as f:
+            self.write(f, chunks)
+            f.seek(0)
+            for block in iter(lambda: f.read(self.block_size), b''):
+                yield block
+
+    def write(self, f, chunks):
+        raise NotImplementedError
+
+
+@register_exporter
+class XLSXExporter(FileExporter):
+    """
+    Excel workbooks, written in XlsxWriter's constant memory mode, which
+    flushes each row to disk as soon as the next one starts.
+    """
+    format = 'xlsx'
+    extension = '.xlsx'
+    content_type = ('application/vnd.openxmlformats-officedocument.'
+                    'spreadsheetml.sheet')
+    available = xlsxwriter is not None
+
+    def write(self, f, chunks):
+        workbook = xlsxwriter.Workbook(f, {
+            'constant_memory': True,
+            'remove_timezone': True,
+            'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+        })
+        sheet = workbook.add_worksheet()
+        sheet.write_row(0, 0, self.headers,
+                        workbook.add_format({'bold': True}))
+        index = 1
+        for rows in chunks:
+            for row in rows:
+                sheet.write_row(index, 0, row)
+                index += 1
+        workbook.close()
+
+
+@register_exporter
+class ParquetExporter(FileExporter):
+    """
+    Parquet files, written through pyarrow a row group per chunk of rows.
+    The schema is fixed before the first row is written, so it's taken
+    from the model fields behind the columns; the columns without one are
+    stored as text.
+    """
+    format = 'parquet'
+    extension = '.parquet'
+    available = pyarrow is not None
+
+    # Django internal field types and their Arrow types
+    INTEGER_FIELDS = frozenset([
+        'AutoField', 'BigAutoField', 'IntegerField', 'BigIntegerField',
+        'SmallIntegerField', 'PositiveIntegerField',
+        'PositiveSmallIntegerField'])
+    BOOLEAN_FIELDS = frozenset(['BooleanField', 'NullBooleanField'])
+
+    def write(self, f, chunks):
+        schema = self.get_schema()
+        text = [i for i, t in enumerate(schema.types)
+                if pyarrow.types.is_string(t)]
+        writer = pyarrow.parquet.ParquetWriter(f, schema)
+        for rows in chunks:
+            if not rows:
+                continue
+            columns = [list(c) for c in zip(*rows)]
+            for i in text:
+                columns[i] = [v if v is None else force_text(v)
+                              for v in columns[i]]
+            arrays = [pyarrow.array(c, type=t)
+                      for c, t in zip(columns, schema.types)]
+            writer.write_table(pyarrow.Table.from_arrays(arrays,
+                                                         schema=schema))
+        writer.close()
+
+    def get_schema(self):
+        return pyarrow.schema([pyarrow.field(name, self.arrow_type(field))
+                               for name, field in zip(self.names,
+                                                      self.fields)])
+
+    def arrow_type(self, field):
+        """
+        The Arrow type of the values of the model ``field``, or text.
+        """
+        kind = field.get_internal_type() if field is not None else None
+        if kind in self.INTEGER_FIELDS:
+            return pyarrow.int64()
+        elif kind in self.BOOLEAN_FIELDS:
+            return pyarrow.bool_()
+        elif kind == 'FloatField':
+            return pyarrow.float64()
+        elif kind == 'DecimalField' and field.max_digits <= 38:
+            return pyarrow.decimal128(field.max_digits,
+                                      field.decimal_places)
+        elif kind == 'DateTimeField':
+            return pyarrow.timestamp(
+                'us', tz='UTC' if settings.USE_TZ else None)
+        elif kind == 'DateField':
+            return pyarrow.date32()
+        elif kind == 'TimeField':
+            return pyarrow.time64('us')
+        return pyarrow.string()
@@ -1,13 +1,40 @@
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Div, HTML, Submit
 import django_filters
+from django.core.cache import cache
 from django.core.exceptions import FieldError
 from django.forms.fields import ChoiceField
-from django.utils.translation import ugettext
+from django.utils.encoding import force_text
+from django.utils.translation import get_language, ugettext
 from django.utils.translation import ugettext_lazy as _
 
 from django_filters.filters import ChoiceFilter
 
+from .cache import make_key, model_version
+
+
+def cache_options(widget, key, timeout):
+    """
+    Cache the ``<option>`` tags rendered by the select ``widget`` under
+    ``key``, once for every selection.
+    """
+    render_options = getattr(widget, 'render_options', None)
+    if render_options is None:
+        return
+
+    def cached_render_options(choices, selected_choices):
+        if choices:
+            # extra choices passed to render() aren't part of the key
+            return render_options(choices, selected_choices)
+        selected = sorted(set(force_text(v) for v in selected_choices))
+        options_key = make_key(key, 'options', *selected)
+        html = cache.get(options_key)
+        if html is None:
+            html = render_options(choices, selected_choices)
+            cache.set(options_key, html, timeout)
+        return html
+    widget.render_options = cached_render_options
+
 
 class BaseFilterSet(django_filters.FilterSet):
 
@@ -18,44 +45,96 @@ class BaseFilterSet(django_filters.FilterSet):
 
         filter_sequence - Explicit ordered list of filters to add.
 
+        choice_cache_timeout - Opt in to caching the choices of the filters
+            backed by a queryset (model choice filters), along with their
+            rendered options, for this many seconds.  Entries are keyed on
+            the queryset model's data version, so saving or deleting one of
+            its instances invalidates them; changes to other models the
+            choice labels show are only picked up when they time out.
+
     """
 
     filter_sequence = []
+    choice_cache_timeout = None
+
+    # crispy helpers by FilterSet class and language, see get_helper
+    _helpers = {}
 
     @property
     def form(self):
         form = super(BaseFilterSet, self).form
 
         if not hasattr(form, 'helper'):
-            form.helper = FormHelper()
-            form.helper.form_method = 'GET'
-            form.helper.form_class = 'form'
-            form.helper.layout = Layout(
+            form.helper = self.get_helper()
+            if self.choice_cache_timeout is not None:
+                self.cache_choices(form)
+        return form
+
+    @classmethod
+    def get_helper(cls):
+        """
+        The crispy FormHelper laying out the filter form.  Helpers only
+        hold the layout, so one is built per FilterSet class and language
+        and shared by all of their forms.
+        """
+        key = (cls, get_language())
+        helper = cls._helpers.get(key)
+        if helper is None:
+            helper = cls._helpers[key] = cls.build_helper()
+        return helper
+
+    @classmethod
+    def build_helper(cls):
+        helper = FormHelper()
+        helper.form_method = 'GET'
+        helper.form_class = 'form'
+        helper.layout = Layout(
+            Div(
                 Div(
+                    Div(
+                        HTML("<h4>%s</h4>" % ugettext('Filtering')),
+                        Div(css_class="filter-table"),
+                        css_class="filter-container"),
                     Div(
                         Div(
-                            HTML("<h4>%s</h4>" % ugettext('Filtering')),
-                            Div(css_class="filter-table"),
-                            css_class="filter-container"),
-                        Div(
-                            Div(
-                                HTML('<div class="filter-selector '
-                                     'btn-group"></div>'),
-                                HTML('<a href="javascript:void(0)" '
-                                     'class="btn filter-buttons btn-reset"'
-                                     '>%s</a>' % ugettext('Reset')),
-                                Submit(
-                                    name='submit', value=ugettext('Apply'),
-                                    css_class='btn btn-primary '
-                                              ' filter-buttons'),
-                                css_class="filter-btns btn-group"
-                            ),
-                            css_class="filter-btns-row btn-toolbar",
+                            HTML('<div class="filter-selector '
+                                 'btn-group"></div>'),
+                            HTML('<a href="javascript:void(0)" '
+                                 'class="btn filter-buttons btn-reset"'
+                                 '>%s</a>' % ugettext('Reset')),
+                            Submit(
+                                name='submit', value=ugettext('Apply'),
+                                css_class='btn btn-primary '
+                                          ' filter-buttons'),
+                            css_class="filter-btns btn-group"
                         ),
-                        Div(
-                            *tuple([f for f in self.filter_sequence]),
-                            css_class='filter-fields'),
-                        css_class="well filtering-well"),
-                    css_class='')
-            )
-        return form
+                        css_class="filter-btns-row btn-toolbar",
+                    ),
+                    Div(
+                        *tuple([f for f in cls.filter_sequence]),
+                        css_class='filter-fields'),
+                    css_class="well filtering-well"),
+                css_class='')
+        )
+        return helper
+
+    def cache_choices(self, form):
+        """
+        Serve the choices of the queryset backed fields of ``form``, and
+        their rendered options, from the cache.  Submitted values are still
+        validated against the queryset.
+        """
+        cls = self.__class__
+        for name, field in form.fields.items():
+            queryset = getattr(field, 'queryset', None)
+            if queryset is None:
+                continue
+            key = make_key('choices', cls.__module__, cls.__name__, name,
+                           get_language(), model_version(queryset.model))
+            choices = cache.get(key)
+            if choices is None:
+                # not list(), which would also query for the iterator's len
+                choices = [choice for choice in field.choices]
+                cache.set(key, choices, self.choice_cache_timeout)
+            field.choices = choices
+            cache_options(field.widget, key, self.choice_cache_timeout)
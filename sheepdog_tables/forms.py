@@ -1,5 +1,6 @@
 import logging
 from django import forms
+from django.core.exceptions import ValidationError
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, HTML, Div, Submit
 
@@ -30,3 +31,50 @@ class EditTableSubmitForm(forms.Form):
                     css_class="filter-btns-row btn-toolbar"),
                 css_class="well filtering-well"),
         )
+
+
+class ScopedPkField(forms.ModelChoiceField):
+    """
+    Primary key field for the forms of a bound edit table formset.  Instead
+    of a query per form, submitted keys are looked up in ``objects``, the
+    rows the formset was bound to, so keys outside the table are rejected.
+    """
+    def __init__(self, objects, *args, **kwargs):
+        self.objects = objects
+        super(ScopedPkField, self).__init__(*args, **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            key = self.queryset.model._meta.pk.to_python(value)
+        except ValidationError:
+            key = None
+        if key not in self.objects:
+            raise ValidationError(self.error_messages['invalid_choice'],
+                                  code='invalid_choice')
+        return self.objects[key]
+
+
+def scope_formset(formset, pks):
+    """
+    Evaluate the queryset of a bound model ``formset`` once and check each
+    form's primary key against it.  Submitted ``pks`` missing from it get an
+    unsaved placeholder instance, so their forms fail validation rather than
+    being matched up with another row.
+    """
+    model = formset.model
+    objects = dict((obj.pk, obj) for obj in formset.get_queryset())
+    # BaseModelFormSet._existing_object looks instances up here
+    formset._object_dict = dict(objects)
+    for pk in pks:
+        formset._object_dict.setdefault(pk, model())
+
+    name = model._meta.pk.name
+    for form in formset.forms:
+        field = form.fields.get(name)
+        if isinstance(field, forms.ModelChoiceField):
+            form.fields[name] = ScopedPkField(
+                objects, field.queryset, required=False,
+                widget=field.widget, initial=field.initial)
+    return formset
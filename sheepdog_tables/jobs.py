@@ -0,0 +1,140 @@
+import errno
+import logging
+import os
+import tempfile
+import time
+import uuid
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
+
+from .workers import submit
+
+logger = logging.getLogger("sheepdog_tables")
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# How long the status of a job is kept, which also bounds how long a job
+# whose process died keeps being reported as running.
+STATUS_TIMEOUT = 60 * 60
+
+
+def export_root(root=None):
+    """
+    The directory export artifacts are written to: ``root`` when given,
+    else the ``SHEEPDOG_TABLES_EXPORT_ROOT`` setting, else a directory in
+    the system's temporary directory.
+    """
+    if root is None:
+        root = getattr(settings, 'SHEEPDOG_TABLES_EXPORT_ROOT', None)
+    if root is None:
+        root = os.path.join(tempfile.gettempdir(), 'sheepdog_tables_exports')
+    try:
+        os.makedirs(root)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+    return root
+
+
+def artifact_path(key, extension, root=None):
+    # keys are namespaced with colons, which not every filesystem allows
+    name = key.rsplit(':', 1)[-1]
+    return os.path.join(export_root(root), '%s%s' % (name, extension))
+
+
+def status_key(key):
+    return 'sheepdog_tables:export:%s' % key
+
+
+def get_status(key):
+    """
+    The status of the export ``key``, or ``None`` if it isn't under way:
+
+        {'state': 'running', 'rows': 2000, 'total': 100000}
+    """
+    return cache.get(status_key(key))
+
+
+def set_status(key, state, **kwargs):
+    status = dict(kwargs, state=state)
+    cache.set(status_key(key), status, STATUS_TIMEOUT)
+    return status
+
+
+def start_export(key, path, write, workers=1):
+    """
+    Start writing the export ``key`` to ``path`` in the background, unless
+    it is already under way, and return its status.
+
+    ``write`` is called with an open file and a ``progress(rows, total)``
+    callback, on a pool of ``workers`` threads kept apart from the ones
+    fetching pages.  The file is written under a temporary name and moved
+    into place once complete, so a partial export is never served.
+    """
+    status = {'state': PENDING, 'rows': 0, 'total': None}
+    if not cache.add(status_key(key), status, STATUS_TIMEOUT):
+        current = get_status(key)
+        if current is not None:
+            if current['state'] == FAILED:
+                # report the failure once, then let the next request retry
+                cache.delete(status_key(key))
+            return current
+
+    def progress(rows, total=None):
+        set_status(key, RUNNING, rows=rows, total=total)
+
+    def job():
+        tmp_path = '%s.%s.tmp' % (path, uuid.uuid4().hex)
+        started = time.time()
+        try:
+            with open(tmp_path, 'wb') as f:
+                write(f, progress)
+            os.rename(tmp_path, path)
+        except Exception as e:
+            logger.exception('export %s failed', key)
+            set_status(key, FAILED, error=str(e))
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        else:
+            logger.info('export %s written in %.2fs', key,
+                        time.time() - started)
+            # the artifact itself now tells that the export is done
+            cache.delete(status_key(key))
+
+    submit(job, workers, name='exports')
+    return status
+
+
+def file_response(path, content_type, filename):
+    """
+    Serve the finished artifact at ``path`` as an attachment.
+    """
+    response = StreamingHttpResponse(FileWrapper(open(path, 'rb')),
+                                     content_type=content_type)
+    response['Content-Length'] = os.path.getsize(path)
+    response['Content-Disposition'] = 'attachment; filename=%s' % filename
+    return response
+
+
+def clear_exports(max_age, root=None):
+    """
+    Remove the artifacts (and stray temporary files) older than ``max_age``
+    seconds.  Artifacts are never overwritten, since a change to the data
+    gives the export a new key, so run this periodically to reclaim the
+    space of the stale ones.
+    """
+    root = export_root(root)
+    cutoff = time.time() - max_age
+    removed = 0
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            removed += 1
+    return removed
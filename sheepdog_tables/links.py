@@ -0,0 +1,133 @@
+import re
+
+from django.core.urlresolvers import (get_script_prefix, get_urlconf,
+                                      reverse, NoReverseMatch)
+from django.utils.encoding import force_text
+
+from .query import attname_for
+
+# Numeric placeholders reversed in place of the real arguments, so the
+# static parts of a url can be cut out of it once.
+_SENTINEL = 7919000000
+_DIGITS = re.compile(r'^[0-9]+$')
+
+_templates = {}
+_resolvers = {}
+
+
+def compile_url(url_name, nargs):
+    """
+    Reverse ``url_name`` once and split the result into the static pieces
+    around its ``nargs`` arguments.  Returns a function building the url
+    from a list of arguments, or ``None`` when the url can't be compiled
+    (it doesn't reverse with numbers, or an argument appears more than once
+    or not at all), in which case ``reverse()`` has to be called per url.
+
+    Compiled urls are only used for arguments made of digits, which covers
+    primary and foreign keys; anything else is still checked against the
+    url pattern by ``reverse()``.
+    """
+    key = (url_name, nargs, get_script_prefix(), get_urlconf())
+    if key in _templates:
+        return _templates[key]
+
+    sentinels = [str(_SENTINEL + i) for i in range(nargs)]
+    try:
+        url = reverse(url_name, args=sentinels)
+        zeros = reverse(url_name, args=['0'] * nargs)
+    except NoReverseMatch:
+        url = None
+
+    build = None
+    if url is not None and all(url.count(s) == 1 for s in sentinels):
+        order = sorted(range(nargs), key=lambda i: url.index(sentinels[i]))
+        pieces, rest = [], url
+        for i in order:
+            head, rest = rest.split(sentinels[i], 1)
+            pieces.append(head)
+        pieces.append(rest)
+        build = _template_builder(pieces, order, url_name)
+        # short arguments must fit the pattern just as well as long ones
+        if build(['0'] * nargs) != zeros:
+            build = None
+    _templates[key] = build
+    return build
+
+
+def _template_builder(pieces, order, url_name):
+    last = pieces[-1]
+    parts = list(zip(pieces, order))
+
+    def build(args):
+        texts = [force_text(a) for a in args]
+        if not all(_DIGITS.match(t) for t in texts):
+            return reverse(url_name, args=args)
+        url = ''.join([p + texts[i] for p, i in parts]) + last
+        if url.startswith('//'):
+            url = '/%%2F%s' % url[2:]
+        return url
+    return build
+
+
+def _legacy_arg(names):
+    """
+    Resolve an argument the way the urlbuilder tag always has: follow each
+    attribute that exists, calling callables, and fall back on the name
+    itself where one doesn't.
+    """
+    def resolve(obj):
+        chain = obj
+        for name in names:
+            chain = getattr(chain, name) if hasattr(chain, name) else name
+            chain = chain() if callable(chain) else chain
+        return chain
+    return resolve
+
+
+def _attname_arg(attname, names):
+    legacy = _legacy_arg(names)
+
+    def resolve(obj):
+        value = getattr(obj, attname)
+        return legacy(obj) if value is None else value
+    return resolve
+
+
+def compile_args(args, model):
+    """
+    Compile the ``ColumnURL.args`` of a url into a function returning the
+    arguments for an object of class ``model``.  Arguments pointing at the
+    target of a foreign key, e.g. ``participant.id``, are read off the
+    foreign key's attname (``participant_id``) without loading the related
+    object.
+    """
+    key = (tuple(args), model)
+    if key in _resolvers:
+        return _resolvers[key]
+
+    resolvers = []
+    for arg in args:
+        names = arg.split('.')
+        attname = attname_for(model, names)
+        if attname is None:
+            resolvers.append(_legacy_arg(names))
+        else:
+            resolvers.append(_attname_arg(attname, names))
+
+    resolve = lambda obj: [r(obj) for r in resolvers]
+    _resolvers[key] = resolve
+    return resolve
+
+
+def build_url(url, obj):
+    """
+    Build the href of ``url`` (a ``ColumnURL``) for ``obj``.
+    """
+    if url is None or obj is None:
+        return ''
+
+    args = compile_args(url.args, obj.__class__)(obj)
+    build = compile_url(url.url, len(args))
+    if build is None:
+        return reverse(url.url, args=args)
+    return build(args)
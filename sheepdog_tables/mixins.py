@@ -1,21 +1,68 @@
 import json
+import logging
+import os
 import re
-import csv
 from functools import update_wrapper
 
-from django.http import QueryDict, HttpResponseRedirect
+from django.http import QueryDict, HttpResponseRedirect, Http404
 from django.utils.decorators import classonlymethod
 from django.utils.safestring import mark_safe
 from django.views.generic.list import (MultipleObjectTemplateResponseMixin,
                                        BaseListView)
-from django.http import HttpResponse
-
-from inspect import getmembers
-
-from .forms import EditTableSubmitForm
-from .paginator import NamespacedPaginator, MockPage
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template import RequestContext
+from django.template.loader import render_to_string
+
+from .cache import bump_version, make_key, record
+from .column import TOTAL, PAGE
+from .export import (CSVExporter, RowsJSONEncoder, accepts_gzip,
+                     get_exporter, gzip_stream, native_value)
+from .forms import EditTableSubmitForm, scope_formset
+from .jobs import DONE, FAILED, artifact_path, file_response, start_export
+from .paginator import (NamespacedPaginator, CountlessPaginator,
+                        KeysetPaginator, MockPage, KEYSET, CACHED, ESTIMATED,
+                        COUNTLESS, cached_count, estimated_count,
+                        count_queryset, freeze_page)
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
 from django.core.paginator import EmptyPage
+from django.db import transaction
+from django.db.models.sql.datastructures import EmptyResultSet
+from .query import bulk_update, iter_chunks
 from .table import Table
+from .timing import PhaseTimer, null_phase
+from .workers import run_all
+
+logger = logging.getLogger("sheepdog_tables")
+
+# The GET keys of ranged filter fields, e.g. ``created_0`` and ``created_1``
+FILTER_KEY = re.compile(r'^(.*)_\d+$')
+
+
+class TableContext(dict):
+    """
+    The context entry of a table.  Entries passed as keyword arguments are
+    callables, evaluated on first lookup and then stored, so a table's
+    queries only run if the template uses it.
+    """
+    def __init__(self, values, **lazy):
+        super(TableContext, self).__init__(values)
+        self.lazy = lazy
+
+    def __missing__(self, key):
+        if key not in self.lazy:
+            raise KeyError(key)
+        value = self[key] = self.lazy.pop(key)()
+        return value
+
+    def __contains__(self, key):
+        return super(TableContext, self).__contains__(key) or key in self.lazy
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
 
 
 class TablesMixin(object):
@@ -41,15 +88,147 @@ class TablesMixin(object):
             {% include "general/table.html %}
         {% endwith %}
 
+    :params
+
+    export_format - The format exported when the request doesn't name one
+                    with its ``format`` parameter.  ``as_csv`` (or its alias
+                    ``as_export``) serves every format registered in
+                    ``export``: csv, tsv and jsonl, plus xlsx and parquet
+                    when XlsxWriter and pyarrow are installed.
+
+    csv_streaming - Stream CSV exports instead of building them in memory.
+                    Rows are fetched ``csv_chunk_size`` at a time and written
+                    out a chunk at a time, so memory use stays flat however
+                    large the export is.  Pass it to ``as_csv`` to enable it
+                    for a single url, e.g.
+                    ``MyView.as_csv(csv_streaming=True)``
+
+    csv_chunk_size - The number of rows fetched and written per chunk when
+                    streaming.  Each chunk is loaded with one ``pk__in``
+                    query, so keep it under 999 on SQLite builds older than
+                    3.32, which allow no more bound variables than that.
+
+    csv_gzip - Gzip streamed exports on the fly for clients that accept it.
+
+    csv_background - Write exports to disk in the background instead of in
+                    the request.  The first request starts the export and
+                    gets a 202 response with its progress as JSON, e.g.
+                    ``{"state": "running", "rows": 2000, "total": 90000}``;
+                    repeating it polls the progress, and once the file is
+                    written serves it.  Pass ``export=status`` to poll
+                    without downloading the finished file, which then
+                    reports ``{"state": "done"}``; binding.coffee does so
+                    for links marked with ``data-table-export``.  Files are
+                    keyed on the table, the format, the queryset's SQL (so
+                    its filters and ordering) and the table's data version,
+                    so later requests for the same data are served straight
+                    from disk.  Old files are never reused, see
+                    ``jobs.clear_exports`` to remove them.
+
+    csv_export_root - The directory exports are written to, defaulting to
+                    the ``SHEEPDOG_TABLES_EXPORT_ROOT`` setting.
+
+    csv_export_workers - The number of background exports run at once,
+                    across the whole process.
+
+    rendered_tables - The keys of the tables to put in the context, or
+                    ``None`` for all of them.  Tables only query the database
+                    once the template looks up their ``page_obj``, so tables
+                    that aren't rendered cost nothing either way.
+
+    partial_template_name - The template ``as_partial`` renders a single
+                    table with.  Wrap a table in an element carrying the
+                    partial url and the table's namespace to have
+                    binding.coffee swap it in place when paging or sorting:
+
+        <div data-table-partial="{% url 'my_view_partial' %}"
+             data-table-ns="main_table">
+            {% with tables.main_table as table %}
+                {% include "tables/table.html" %}
+            {% endwith %}
+        </div>
+
+    table_workers - Opt in to fetching the pages of the rendered tables
+                    concurrently, on a process wide pool of this many
+                    threads, each with its own database connection.  Pages
+                    are fetched up front instead of when the template uses
+                    them, and the workers can't see uncommitted changes of
+                    the request's transaction.
+
+    table_timeout - Seconds to wait for the concurrent tables.  A table that
+                    times out or fails is rendered with its
+                    ``table_unavailable`` message, with the exception in its
+                    ``error`` context entry.
+
+    table_timing - Time each phase of building, rendering and exporting the
+                    tables: ``queryset`` (``get_table_qs``), ``filter``,
+                    ``sort``, ``annotate``, ``paginate`` (which counts),
+                    ``fetch``, ``aggregate`` (the footer aggregates),
+                    ``render`` / ``rows`` (through the
+                    ``render_table``, ``render_rows`` tags and ``partial``)
+                    and ``export``.  The wall time, query count and row
+                    count of each are logged on the ``sheepdog_tables``
+                    logger and sent with the ``timing.table_timed`` signal.
+                    Pages are fetched as soon as they are paginated while
+                    timing, so their queries aren't counted as rendering.
+
+    table_server_timing - Time the tables as ``table_timing`` does, and send
+                    the timings to the browser in a ``Server-Timing``
+                    header.
     """
+    export_format = 'csv'
+    csv_streaming = False
+    csv_chunk_size = 900
+    csv_gzip = False
+    csv_background = False
+    csv_export_root = None
+    csv_export_workers = 1
+    rendered_tables = None
+    partial_template_name = 'tables/table.html'
+    table_workers = None
+    table_timeout = None
+    table_timing = False
+    table_server_timing = False
 
     def dispatch(self, *args, **kwargs):
         self.table_pages = {}
+        self.table_cache_keys = {}
+        self.table_errors = {}
+        self.table_count_querysets = {}
+        self.table_totals = {}
+        self.table_base_queryset = None
+        self.table_timer = None
+        if self.table_timing or self.table_server_timing:
+            self.table_timer = PhaseTimer(self.__class__)
 
         if kwargs.pop('__as_csv', False):
-            return self.csv(*args, **kwargs)
+            response = self.csv(*args, **kwargs)
+        elif kwargs.pop('__as_partial', False):
+            response = self.partial(*args, **kwargs)
+        else:
+            response = super(TablesMixin, self).dispatch(*args, **kwargs)
+
+        if self.table_server_timing:
+            if hasattr(response, 'add_post_render_callback'):
+                # template responses render their tables later on
+                response.add_post_render_callback(self.add_server_timing)
+            else:
+                self.add_server_timing(response)
+        return response
 
-        return super(TablesMixin, self).dispatch(*args, **kwargs)
+    def add_server_timing(self, response):
+        timing = self.table_timer.server_timing()
+        if timing:
+            response['Server-Timing'] = timing
+
+    def time_phase(self, table_key, phase):
+        """
+        A context manager timing ``phase`` of the table ``table_key`` when
+        timing is on.  It gives a dict to set the number of ``rows`` on.
+        """
+        if self.table_timer is None:
+            return null_phase
+        return self.table_timer.phase(table_key, phase)
 
     @classonlymethod
     def as_csv(cls, **initkwargs):
@@ -66,33 +245,239 @@ class TablesMixin(object):
         update_wrapper(csv_view, cls.dispatch, assigned=())
         return csv_view
 
-    def csv(self, *args, **kwargs):
+    @classonlymethod
+    def as_export(cls, **initkwargs):
         """
-        CSV Renderer for a table view. Exports the view contents as a CSV
-        using the same internals as a standard view.
+        A view exporting a table in the format named by the ``format``
+        parameter, the same as ``as_csv``.
         """
+        return cls.as_csv(**initkwargs)
 
+    @classonlymethod
+    def as_partial(cls, **initkwargs):
+        """
+        A view returning a single table of the view, for swapping it in
+        place when paging or sorting.  See ``partial``.
+        """
+        def partial_view(request, *args, **kwargs):
+            kwargs['__as_partial'] = True
+            self = cls(**initkwargs)
+            self.request = request
+            self.args = args
+            self.kwargs = kwargs
+
+            return self.dispatch(request, *args, **kwargs)
+
+        update_wrapper(partial_view, cls, updated=())
+        update_wrapper(partial_view, cls.dispatch, assigned=())
+        return partial_view
+
+    def partial(self, *args, **kwargs):
+        """
+        Renders the table named by the ``namespace`` GET parameter on its
+        own, running only that table's queries.  Responds with the table's
+        HTML fragment (``partial_template_name``), or with its rows as JSON
+        when ``format=json`` is passed:
+
+            {"namespace": "main_table", "sort": "-created",
+             "headers": ["Name", ...], "rows": [["Bob", ...], ...],
+             "page": {"number": 2, "count": 80, "pages": [1, 2, 3, 4],
+                      "previous": 1, "next": 3}}
+        """
         table_key = self.request.GET.get('namespace', 'main_table')
+        if table_key not in self.get_table_keys():
+            raise Http404('No table %s' % table_key)
+
+        entry = self.get_table_context(table_key)
+        if self.request.GET.get('format') == 'json':
+            data = json.dumps(self.get_partial_data(entry),
+                              cls=RowsJSONEncoder)
+            return HttpResponse(data, content_type='application/json')
+
+        with self.time_phase(table_key, 'render'):
+            html = render_to_string(
+                self.partial_template_name, {'table': entry},
+                context_instance=RequestContext(self.request))
+        return HttpResponse(html)
+
+    def get_partial_data(self, entry):
+        table = entry['table']
+        page = entry['page_obj']
+        columns = table.columns()
+
+        data = {
+            'namespace': entry['namespace'],
+            'sort': entry['applied_sort'],
+            'headers': table.headers(),
+            'rows': [[col.value(obj) for col in columns]
+                     for obj in page.object_list],
+            'page': None,
+        }
+        paginator = getattr(page, 'paginator', None)
+        if paginator is not None:
+            data['page'] = {
+                'number': page.number,
+                'count': getattr(paginator, 'count', None),
+                'pages': list(paginator.pages()),
+                'previous': (page.previous_page_number()
+                             if page.has_previous() else None),
+                'next': page.next_page_number() if page.has_next() else None,
+            }
+        return data
 
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = (
-            'attachment; filename=%s' % self.get_csv_filename(table_key))
+    def csv(self, *args, **kwargs):
+        """
+        Export Renderer for a table view. Exports the view contents as a CSV,
+        or in the requested ``format``, using the same internals as a
+        standard view.
+        """
 
-        writer = csv.writer(response)
+        table_key = self.request.GET.get('namespace', 'main_table')
         table = self.get_table(table_key)
-        writer.writerow(table.headers())
 
-        filtered_qs = table.filter(self.get_table_qs(table_key).all())
-        qs = table.annotate(filtered_qs)
+        with self.time_phase(table_key, 'queryset'):
+            filtered_qs = table.filter(self.get_table_qs(table_key).all())
+            qs = table.project(table.fetch_related(
+                table.annotate_page_columns(table.annotate(filtered_qs))),
+                page_annotations=True)
+        exporter = self.get_exporter(table,
+                                     getattr(filtered_qs, 'model', None))
+
+        if self.csv_background:
+            return self.background_export(table, table_key, exporter,
+                                          filtered_qs, qs)
+        elif self.csv_streaming:
+            chunks = self.export_chunks(table, table_key, exporter, qs)
+            response = self.stream_export_response(exporter, chunks)
+        else:
+            response = HttpResponse(content_type=exporter.content_type)
+            prepare = self.get_row_preparer(exporter)
+            with self.time_phase(table_key, 'export') as timing:
+                objects = table.resolve_batches(qs)
+                rows = (prepare(table, obj) for obj in objects)
+                for data in exporter.stream([rows]):
+                    response.write(data)
+                timing['rows'] = len(objects)
 
-        for obj in qs:
-            writer.writerow(self.prepare_obj_for_csv(table, obj))
+        response['Content-Disposition'] = (
+            'attachment; filename=%s'
+            % self.get_export_filename(table_key, exporter))
+        return response
 
+    def get_exporter(self, table, model=None):
+        """
+        The exporter for the requested format, set up for ``table`` and the
+        ``model`` it exports.
+        """
+        format = self.request.GET.get('format', self.export_format)
+        cls = get_exporter(format)
+        if cls is None or not cls.available:
+            raise Http404("Can't export %s" % format)
+        return cls(table.headers(), list(table.table_sequence),
+                   table.export_fields(model))
+
+    def stream_export_response(self, exporter, chunks):
+        content = exporter.stream(chunks)
+        accept = self.request.META.get('HTTP_ACCEPT_ENCODING', '')
+        compress = self.csv_gzip and exporter.compressible
+        gzipped = compress and accepts_gzip(accept)
+
+        response = StreamingHttpResponse(
+            gzip_stream(content) if gzipped else content,
+            content_type=exporter.content_type)
+        if compress:
+            response['Vary'] = 'Accept-Encoding'
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
         return response
 
+    def export_chunks(self, table, table_key, exporter, queryset,
+                      progress=None):
+        """
+        Generates the prepared rows of the export ``csv_chunk_size`` at a
+        time, reporting the rows done so far and the total to ``progress``.
+        """
+        total = None
+        if progress is not None:
+            base = count_queryset(queryset)
+            total = base.count() if hasattr(base, 'query') else len(base)
+            progress(0, total)
+
+        prepare = self.get_row_preparer(exporter)
+        rows = 0
+        with self.time_phase(table_key, 'export') as timing:
+            for chunk in iter_chunks(queryset, self.csv_chunk_size):
+                chunk = table.resolve_batches(chunk)
+                yield [prepare(table, obj) for obj in chunk]
+                rows += len(chunk)
+                timing['rows'] = rows
+                if progress is not None:
+                    progress(rows, total)
+
+    def background_export(self, table, table_key, exporter, filtered_qs,
+                          queryset):
+        """
+        Serves the export from disk if it has been written, and starts or
+        reports on the job writing it otherwise.
+        """
+        key = self.get_export_key(table, table_key, exporter, filtered_qs)
+        path = artifact_path(key, exporter.extension, self.csv_export_root)
+        hit = os.path.exists(path)
+        if hit and self.request.GET.get('export') == 'status':
+            return HttpResponse(json.dumps({'state': DONE}),
+                                content_type='application/json')
+        record(table.__class__.__name__, 'export', hit)
+        if hit:
+            return file_response(path, exporter.content_type,
+                                 self.get_export_filename(table_key, exporter))
+
+        def write(f, progress):
+            exporter.write(f, self.export_chunks(table, table_key, exporter,
+                                                 queryset, progress))
+
+        status = start_export(key, path, write, self.csv_export_workers)
+        return HttpResponse(json.dumps(status),
+                            content_type='application/json',
+                            status=500 if status['state'] == FAILED else 202)
+
+    def get_export_key(self, table, table_key, exporter, queryset):
+        """
+        Builds the key of a background export from the table class,
+        namespace and columns, the format, the queryset's SQL and the
+        table's data version.
+        """
+        try:
+            query = repr(queryset.query.sql_with_params())
+        except AttributeError:
+            query = self.request.GET.urlencode()
+        except EmptyResultSet:
+            query = None
+        return make_key(
+            'export', table.__class__.__module__, table.__class__.__name__,
+            table_key, ','.join(table.table_sequence), exporter.format, query,
+            table.get_cache_version(queryset))
+
+    def get_export_filename(self, table_key, exporter):
+        if exporter.format == CSVExporter.format:
+            return self.get_csv_filename(table_key)
+        return '%s-export%s' % (table_key or 'table', exporter.extension)
+
     def get_csv_filename(self, table_key=None):
         return '%s-export.csv' % (table_key or 'table')
 
+    def get_row_preparer(self, exporter):
+        if exporter.encoded:
+            return self.prepare_obj_for_csv
+        return self.prepare_obj_for_export
+
+    def prepare_obj_for_export(self, table, obj):
+        """
+        The row of ``obj`` for the typed exporters, which keeps the native
+        types of the column values, and their empty values.
+        """
+        return [native_value(table.table_columns[key].export_value(obj))
+                for key in table.table_sequence]
+
     def prepare_obj_for_csv(self, table, obj):
         cols = []
         for key in table.table_sequence:
@@ -102,7 +487,17 @@ class TablesMixin(object):
         return cols
 
     def get_table_keys(self):
-        return [k for k, v in getmembers(self) if isinstance(v, Table)]
+        cls = self.__class__
+        if '_table_keys' not in vars(cls):
+            # collected once per view class; dir() doesn't evaluate
+            # properties the way getmembers() would.
+            cls._table_keys = [k for k in dir(cls)
+                               if isinstance(getattr(cls, k, None), Table)]
+        # tables set on the instance, e.g. through as_view(), still count
+        instance = vars(self)
+        keys = set(k for k in cls._table_keys if k not in instance)
+        keys.update(k for k, v in instance.items() if isinstance(v, Table))
+        return sorted(keys)
 
     def get_table(self, table_key):
         return getattr(self, table_key, None)
@@ -113,47 +508,277 @@ class TablesMixin(object):
     def get_current_sort(self, table_key):
         return self.request.GET.get('%s-sort' % table_key, None)
 
-    def get_page_data(self, table_key):
-        if table_key not in self.table_pages.keys():
-
-            table = self.get_table(table_key)
-            filtered_qs = table.filter(self.get_table_qs(table_key).all())
+    def get_page_queryset(self, table_key):
+        """
+        The filtered, sorted and annotated queryset a table's page is cut
+        from.  Building it doesn't touch the database.
+        """
+        table = self.get_table(table_key)
+        with self.time_phase(table_key, 'queryset'):
+            qs = self.get_table_qs(table_key).all()
+        with self.time_phase(table_key, 'filter'):
+            filtered_qs = table.filter(qs)
+        with self.time_phase(table_key, 'sort'):
             sorted_qs = table.sort(
                 filtered_qs,
                 self.get_current_sort(table_key))
 
-            qs = table.annotate(sorted_qs)
-            p = self.get_current_page(table_key)
-            if table.is_paged:
-                paginator = NamespacedPaginator(
-                    qs, table.table_page_limit, namespace=table_key,
-                    current_page=p)
-                try:
-                    page = paginator.page(p)
-                except EmptyPage:
-                    page = paginator.page(paginator.num_pages)
-            else:
-                page = MockPage(qs)
+        with self.time_phase(table_key, 'annotate'):
+            self.table_count_querysets[table_key] = table.annotate_count(
+                filtered_qs)
+            return table.project(
+                table.fetch_related(table.annotate(sorted_qs)))
 
-            self.table_pages[table_key] = page
+    def get_page_data(self, table_key):
+        if table_key not in self.table_pages.keys():
+            self.table_pages[table_key] = self.build_page(
+                table_key, self.get_page_queryset(table_key))
 
         return self.table_pages[table_key]
 
+    def build_page(self, table_key, queryset):
+        table = self.get_table(table_key)
+        if table.table_cache_timeout is not None:
+            return self.get_cached_page(table, table_key, queryset)
+        return self.paginate_table(table, table_key, queryset)
+
+    def evaluate_pages(self, table_keys):
+        """
+        Count and fetch the pages of ``table_keys`` at the same time on a
+        pool of ``table_workers`` threads.  Querysets are built here, and
+        only evaluated in the workers.  A table that fails, whether building
+        its queryset or in its worker, or that outlasts ``table_timeout``
+        gets an empty page, with the exception stored in ``table_errors``.
+        """
+        def task(table_key, queryset):
+            def evaluate():
+                page = self.build_page(table_key, queryset)
+                # fill the result cache while on the worker's connection
+                len(page.object_list)
+                return page
+            return evaluate
+
+        tasks, failed = {}, {}
+        for k in table_keys:
+            if k in self.table_pages:
+                continue
+            try:
+                tasks[k] = task(k, self.get_page_queryset(k))
+            except Exception as e:
+                logger.exception('table %s failed', k)
+                failed[k] = e
+        pages, errors = run_all(tasks, self.table_workers, self.table_timeout)
+        errors.update(failed)
+        for k in errors:
+            pages[k] = MockPage([])
+        self.table_pages.update(pages)
+        self.table_errors.update(errors)
+
+    def paginate_table(self, table, table_key, queryset):
+        with self.time_phase(table_key, 'paginate'):
+            page = self.get_page(table, table_key, queryset)
+
+        columns = table.columns()
+        annotated = any(col.page_annotation for col in columns)
+        batched = any(col.batch is not None for col in columns)
+        if annotated or batched or self.table_timer is not None:
+            with self.time_phase(table_key, 'fetch') as timing:
+                page.object_list = list(page.object_list)
+                if annotated:
+                    model = getattr(count_queryset(queryset), 'model', None)
+                    table.annotate_page(page.object_list, model)
+                table.resolve_batches(page.object_list)
+                timing['rows'] = len(page.object_list)
+        return page
+
+    def get_page(self, table, table_key, queryset):
+        p = self.get_current_page(table_key)
+        if table.is_paged and table.table_pagination == KEYSET:
+            paginator = KeysetPaginator(
+                queryset, table.table_page_limit, namespace=table_key,
+                current_page=p, ordering=table.get_ordering(
+                    self.get_current_sort(table_key)))
+            page = paginator.page(p)
+        elif table.is_paged:
+            paginator_class = (CountlessPaginator
+                               if table.table_count == COUNTLESS
+                               else NamespacedPaginator)
+            paginator = paginator_class(
+                queryset, table.table_page_limit, namespace=table_key,
+                current_page=p,
+                count_function=self.get_count_function(table, table_key))
+            try:
+                page = paginator.page(p)
+            except EmptyPage:
+                page = paginator.page(paginator.num_pages)
+            if (table.table_count in (CACHED, ESTIMATED) and
+                    page.number > 1 and not len(page)):
+                # the estimated or cached count ran past the real end, so
+                # count exactly and fall back on the last page
+                base = self.table_count_querysets.get(table_key)
+                if base is None:
+                    base = count_queryset(queryset)
+                paginator._count = base.count()
+                paginator._num_pages = None
+                page = paginator.page(paginator.num_pages)
+        else:
+            page = MockPage(queryset)
+        return page
+
+    def get_cached_page(self, table, table_key, queryset):
+        """
+        Fetch the evaluated page from the cache, paginating and storing it on
+        a miss.
+        """
+        key = self.table_cache_keys.get(table_key)
+        if key is None:
+            key = self.get_table_cache_key(table, table_key, queryset)
+            self.table_cache_keys[table_key] = key
+
+        page = cache.get(key)
+        record(table.__class__.__name__, 'page', page is not None)
+        if page is None:
+            page = freeze_page(self.paginate_table(table, table_key, queryset))
+            cache.set(key, page, table.table_cache_timeout)
+        return page
+
+    def get_table_cache_key(self, table, table_key, queryset):
+        """
+        Builds the cache key of a table's page from the table class,
+        namespace, page, sort and the queryset's SQL (which covers filters
+        and any per user restrictions in ``get_table_qs``), plus the
+        table's data version.
+        """
+        base = count_queryset(queryset)
+        try:
+            query = repr(base.query.sql_with_params())
+        except AttributeError:
+            # not a queryset, so fall back to the request's parameters
+            query = self.request.GET.urlencode()
+        except EmptyResultSet:
+            query = None
+        return make_key(
+            table.__class__.__module__, table.__class__.__name__, table_key,
+            self.get_current_page(table_key),
+            self.get_current_sort(table_key), query,
+            table.get_cache_version(base))
+
+    def get_count_function(self, table, table_key):
+        """
+        Returns the count_function for the table's paginator, according to
+        its ``table_count`` strategy.  Counts run against the filtered
+        queryset recorded by ``get_page_queryset``, without the annotations
+        that don't change its rows.
+        """
+        base = self.table_count_querysets.get(table_key)
+        if table.table_count == CACHED:
+            count = lambda qs: cached_count(qs, table_key,
+                                            table.table_count_timeout)
+        elif table.table_count == ESTIMATED:
+            count = estimated_count
+        elif base is not None and table.has_footer(TOTAL):
+            # counted by the query computing the footer totals
+            count = lambda qs: self.get_table_totals(
+                table, table_key, count=True)[1]
+        elif base is not None:
+            count = lambda qs: qs.count()
+        else:
+            return None
+
+        def count_function(object_list):
+            qs = base if base is not None else count_queryset(object_list)
+            return count(qs) if hasattr(qs, 'query') else len(qs)
+        return count_function
+
+    def get_table_totals(self, table, table_key, count=False):
+        """
+        The ``(values, count)`` of the table's total footer aggregates over
+        its filtered queryset, computed once per request.  With ``count``,
+        the row count is computed by the same query.
+        """
+        totals = self.table_totals.get(table_key)
+        if totals is None or (count and totals[1] is None):
+            base = self.table_count_querysets.get(table_key)
+            with self.time_phase(table_key, 'aggregate'):
+                totals = table.aggregate(base, TOTAL, count)
+            self.table_totals[table_key] = totals
+        return totals
+
+    def get_table_footer(self, table_key):
+        """
+        The footer rows of a table's aggregates (see ``Table.footer_rows``),
+        or ``None`` if it has none.  Only tables of model querysets are
+        aggregated.
+        """
+        table = self.get_table(table_key)
+        if not table.has_footer() or table_key in self.table_errors:
+            return None
+        page = self.get_page_data(table_key)
+        base = self.table_count_querysets.get(table_key)
+        if not hasattr(base, 'aggregate'):
+            return None
+
+        page_values = total_values = None
+        if table.has_footer(PAGE):
+            with self.time_phase(table_key, 'aggregate'):
+                page_values = table.aggregate_page(page.object_list, base)
+        if table.has_footer(TOTAL):
+            total_values = self.get_table_totals(table, table_key)[0]
+        return table.footer_rows(page_values, total_values)
+
+    def get_cache_key(self, table_key):
+        """
+        The cache key of a table's page, or ``None`` if it isn't cached (or
+        couldn't be fetched).
+        """
+        table = self.get_table(table_key)
+        if (table.table_cache_timeout is None or
+                table_key in self.table_errors):
+            return None
+        if table_key not in self.table_cache_keys:
+            self.table_cache_keys[table_key] = self.get_table_cache_key(
+                table, table_key, self.get_page_queryset(table_key))
+        return self.table_cache_keys[table_key]
+
+    def get_rendered_table_keys(self):
+        """
+        The tables put in the context, which defaults to all of them.  Set
+        ``rendered_tables`` or override this to only offer some of them to
+        the template, e.g. the active tab of a page.
+        """
+        if self.rendered_tables is None:
+            return self.get_table_keys()
+        return [k for k in self.get_table_keys() if k in self.rendered_tables]
+
+    def get_table_context(self, table_key):
+        """
+        Builds the context entry of a table.  The page, footer and cache key
+        are only worked out when the template first looks them up.
+        """
+        values = {
+            'namespace': table_key,
+            'table': self.get_table(table_key),
+            'applied_sort': self.get_current_sort(table_key),
+            'error': self.table_errors.get(table_key),
+            'timer': self.table_timer,
+        }
+        return TableContext(
+            values,
+            page_obj=lambda: self.get_page_data(table_key),
+            footer=lambda: self.get_table_footer(table_key),
+            cache_key=lambda: self.get_cache_key(table_key))
+
     def get_context_data(self, **kwargs):
 
         ctx = super(TablesMixin, self).get_context_data(**kwargs)
 
-        # Class Dict shortcut
-        table_keys = self.get_table_keys()
+        table_keys = self.get_rendered_table_keys()
+        if self.table_workers:
+            self.evaluate_pages(table_keys)
+
         tables = {}
-        # Note, l(k) is the table in context
         for k in table_keys:
-            table = dict()
-            table['namespace'] = k
-            table['table'] = self.get_table(k)
-            table['page_obj'] = self.get_page_data(k)
-            table['applied_sort'] = self.get_current_sort(k)
-            tables.update({k: table})
+            tables[k] = self.get_table_context(k)
 
         ctx.update({'tables': tables})
         return ctx
@@ -169,7 +794,16 @@ class TablesMixin(object):
         used to decide what to display, as opposed to passing all of that info
         around.
         """
-        return self.get_queryset().all()
+        return self.get_base_queryset().all()
+
+    def get_base_queryset(self):
+        """
+        The view's ``get_queryset()``, built once per request and shared by
+        its tables, which each work on a copy.
+        """
+        if self.table_base_queryset is None:
+            self.table_base_queryset = self.get_queryset()
+        return self.table_base_queryset
 
 
 class EditTablesMixin(TablesMixin):
@@ -181,6 +815,7 @@ class EditTablesMixin(TablesMixin):
     This is to be used in place of the TablesMixin where required, not in
     conjuntion with it.
     """
+    partial_template_name = 'tables/edittable.html'
 
     def get_context_data(self, **kwargs):
         """
@@ -196,14 +831,21 @@ class EditTablesMixin(TablesMixin):
         """
         ctx = super(EditTablesMixin, self).get_context_data(**kwargs)
 
-        formsets = kwargs.pop('formsets', self.get_formsets())
+        formsets = kwargs.pop('formsets', None)
 
-        for k, tbl_entry in ctx['tables'].items():
-            tbl_entry['formset'] = formsets[k]
-            tbl_entry['submit_form'] = EditTableSubmitForm(
-                table=self.get_table(k), table_key=k)
+        if formsets is not None:
+            for k, tbl_entry in ctx['tables'].items():
+                tbl_entry['formset'] = formsets[k]
         return ctx
 
+    def get_table_context(self, table_key):
+        entry = super(EditTablesMixin, self).get_table_context(table_key)
+        # like the page, formsets are only built when rendered
+        entry.lazy['formset'] = lambda: self.get_formset(table_key)
+        entry['submit_form'] = EditTableSubmitForm(
+            table=self.get_table(table_key), table_key=table_key)
+        return entry
+
     def get_formsets(self):
         """
         Take a page from the FormView's get_form method, but to work
@@ -211,20 +853,48 @@ class EditTablesMixin(TablesMixin):
 
         Is used to both build, and bind the forms within the formset.
         """
-        fs = {}
+        return dict((k, self.get_formset(k)) for k in self.get_table_keys())
 
-        for k in self.get_table_keys():
-            table = self.get_table(k)
-            qs = self.get_page_data(k).object_list
+    def get_formset(self, table_key):
+        table = self.get_table(table_key)
 
-            # Avoid ValidationErrors by not attempting to construct FormSets
-            # with no data.
-            # TODO: Generate some kind of feedback for an empty submission
-            if qs and self.request.method == 'POST':
-                fs[k] = table.FormSet(self.request.POST, prefix=k)
-            else:
-                fs[k] = table.FormSet(queryset=qs, prefix=k)
-        return fs
+        # Avoid ValidationErrors by not attempting to construct FormSets
+        # with no data.
+        # TODO: Generate some kind of feedback for an empty submission
+        if self.request.method == 'POST':
+            pks = self.get_submitted_pks(table, table_key)
+            if pks:
+                # bind to just the submitted rows, as far as the table
+                # lets this user see them.
+                qs = table.filter(self.get_table_qs(table_key).all())
+                formset = table.FormSet(self.request.POST, prefix=table_key,
+                                        queryset=qs.filter(pk__in=pks))
+                return scope_formset(formset, pks)
+
+        qs = self.get_page_data(table_key).object_list
+        return table.FormSet(queryset=qs, prefix=table_key)
+
+    def get_submitted_pks(self, table, table_key):
+        """
+        The primary keys of the rows posted for the table's formset.
+        """
+        data = self.request.POST
+        try:
+            total = int(data.get('%s-TOTAL_FORMS' % table_key, 0))
+        except ValueError:
+            return []
+
+        pk_field = table.FormSet.model._meta.pk
+        pks = []
+        for i in range(min(total, table.FormSet.absolute_max)):
+            value = data.get('%s-%s-%s' % (table_key, i, pk_field.name))
+            try:
+                pk = pk_field.to_python(value) if value else None
+            except ValidationError:
+                pk = None
+            if pk is not None and pk not in pks:
+                pks.append(pk)
+        return pks
 
     def post(self, request, *args, **kwargs):
         """
@@ -236,12 +906,18 @@ class EditTablesMixin(TablesMixin):
         ones who do.
         """
         # artifact of subclassing BaseListView up the chain.
-        self.object_list = self.get_queryset()
+        self.object_list = self.get_base_queryset()
 
         formsets = self.get_formsets()
         valid = True
-        for formset in formsets.values():
-            if formset.is_valid():
+        for k, formset in formsets.items():
+            table = self.get_table(k)
+            if not formset.is_bound:
+                # nothing was submitted for this table
+                continue
+            elif table.table_bulk_save:
+                valid = self.bulk_save(table, formset) and valid
+            elif formset.is_valid():
                 formset.save()
             else:
                 # save any correct ones.
@@ -250,6 +926,40 @@ class EditTablesMixin(TablesMixin):
 
         return self.form_valid() if valid else self.form_invalid(formsets)
 
+    def bulk_save(self, table, formset):
+        """
+        Save the valid forms of ``formset`` that changed, writing the
+        table's editable fields in one transaction.  Returns whether the
+        whole formset was valid.
+        """
+        valid = formset.is_valid()
+        # forms keep their errors, so this doesn't validate them again
+        changed = [form for form in formset.forms
+                   if form.is_valid() and form.has_changed()]
+        if not changed:
+            return valid
+
+        fields = table.editable_fields()
+        objects = []
+        for form in changed:
+            obj = form.save(commit=False)
+            for field in obj._meta.local_fields:
+                if getattr(field, 'auto_now', False):
+                    field.pre_save(obj, False)
+            objects.append(obj)
+
+        model = formset.model
+        m2m = [f.name for f in model._meta.many_to_many
+               if f.name in formset.forms[0].fields]
+        with transaction.atomic(using=model._default_manager.db):
+            bulk_update(model, objects, fields)
+            if m2m:
+                for form in changed:
+                    form.save_m2m()
+        # no post_save was sent, so cached pages have to be told
+        bump_version(model)
+        return valid
+
     def form_valid(self):
         return HttpResponseRedirect(self.get_success_url())
 
@@ -271,24 +981,33 @@ class FilteredListView(MultipleObjectTemplateResponseMixin, BaseListView):
     filter_class = None
     propagate_filter_params = False
 
+    _filterset = None
     _filter_form = None
     _filter_keys = None
 
+    def get_filterset(self):
+        """
+        The ``filter_class`` FilterSet of the request.  It's built and
+        validated once per request, however many times the queryset is
+        asked for.
+        """
+        if self._filterset is None:
+            qs = super(FilteredListView, self).get_queryset()
+            self._filterset = self.filter_class(self.request.GET, queryset=qs)
+            self._filter_form = self._filterset.form
+            self._filter_keys = self._filterset.filters.keys()
+        return self._filterset
+
     def get_queryset(self):
         """
         If `filter_class` is unspecified, the queryset will be returned
         unfiltered.
         """
-        qs = super(FilteredListView, self).get_queryset()
-
         if self.filter_class:
-            # Filter the query set
-            f = self.filter_class(self.request.GET, queryset=qs)
-            self._filter_form = f.form
-            self._filter_keys = f.filters.keys()
-            qs = f.qs
+            # a copy, so evaluating it leaves the FilterSet's own alone
+            return self.get_filterset().qs.all()
 
-        return qs
+        return super(FilteredListView, self).get_queryset()
 
     def get_context_data(self, **kwargs):
         context = super(FilteredListView, self).get_context_data(**kwargs)
@@ -303,15 +1022,15 @@ class FilteredListView(MultipleObjectTemplateResponseMixin, BaseListView):
         This function allows for the proper propagation
         of get variables from ranged filter fields.
         """
-        p = re.compile("^(.*)_\d+$")
-        m = p.match(key)
+        m = FILTER_KEY.match(key)
         return m.group(1) if m is not None else key
 
     def _get_filter_params(self):
         filter_params = QueryDict('').copy()
 
+        filter_keys = set(self._filter_keys or ())
         for k in self.request.GET.keys():
-            if self.filter_key(k) in self._filter_keys:
+            if self.filter_key(k) in filter_keys:
                 filter_params.setlist(k, self.request.GET.getlist(k))
 
         return filter_params.urlencode()
@@ -1 +1,9 @@
-# Here so we can test
\ No newline at end of file
+# Here so we can test.
+from django.conf import settings
+
+from . import cache
+
+if getattr(settings, 'SHEEPDOG_TABLES_CACHE_VERSIONS', False):
+    # connect the data version receivers in every process that loads the
+    # app, not just the ones that import a cached table.
+    cache.watch()
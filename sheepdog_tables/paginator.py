@@ -1,4 +1,116 @@
-from django.core.paginator import Paginator
+import base64
+import datetime
+import hashlib
+import json
+import math
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.core.paginator import (Paginator, Page, EmptyPage,
+                                   PageNotAnInteger)
+from django.db import connections
+from django.db.models import Q
+from django.db.models.sql.datastructures import EmptyResultSet
+from django.utils.dateparse import parse_date, parse_datetime, parse_time
+
+from .column import compile_chain, split_chain
+
+OFFSET = 'offset'
+KEYSET = 'keyset'
+
+EXACT = 'exact'
+CACHED = 'cached'
+ESTIMATED = 'estimated'
+COUNTLESS = 'countless'
+
+
+# Sort values are tagged with their type in cursors, and written at full
+# precision, since the row a page seeks from must compare exactly equal.
+CURSOR_TYPES = [
+    ('datetime', datetime.datetime, lambda v: v.isoformat(), parse_datetime),
+    ('date', datetime.date, lambda v: v.isoformat(), parse_date),
+    ('time', datetime.time, lambda v: v.isoformat(), parse_time),
+    ('decimal', Decimal, str, Decimal),
+]
+
+
+def encode_value(value):
+    for tag, type_, encode, _ in CURSOR_TYPES:
+        if isinstance(value, type_):
+            return [tag, encode(value)]
+    return [None, value]
+
+
+def decode_value(data):
+    """
+    The sort value of a cursor from its ``encode_value`` form.  Raises
+    ValueError if it can't be restored.
+    """
+    tag, value = data
+    if tag is None:
+        return value
+    for name, _, _, decode in CURSOR_TYPES:
+        if name == tag:
+            try:
+                value = decode(value)
+            except (TypeError, InvalidOperation):
+                value = None
+            if value is None:
+                raise ValueError('Invalid %s in cursor' % tag)
+            return value
+    raise ValueError('Unknown cursor value type %r' % tag)
+
+
+def count_queryset(queryset):
+    """
+    The queryset counts should run against, skipping any projection.
+    """
+    base = getattr(queryset, 'count_queryset', None)
+    return queryset if base is None else base
+
+
+def cached_count(queryset, namespace=None, timeout=300):
+    """
+    Count ``queryset`` through the cache.  The key is built from the
+    namespace and the queryset's SQL, so every filter combination gets its
+    own entry.
+    """
+    try:
+        sql = repr(queryset.query.sql_with_params())
+    except EmptyResultSet:
+        return 0
+    key = 'sheepdog_tables:count:%s:%s' % (
+        namespace, hashlib.md5(sql).hexdigest())
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout)
+    return count
+
+
+def estimated_count(queryset, threshold=1000):
+    """
+    Use the query planner's row estimate as the count on PostgreSQL.  Small
+    estimates are unreliable and exact counts are cheap there anyway, so
+    below ``threshold`` (and on other databases) this counts exactly.
+    Estimates can run past the real end, so ``TablesMixin.get_page`` counts
+    exactly when a page it leads to comes back empty.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+
+    cursor = connection.cursor()
+    cursor.execute('EXPLAIN (FORMAT JSON) %s' % sql, params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, basestring):
+        plan = json.loads(plan)
+    rows = int(plan[0]['Plan']['Plan Rows'])
+    return queryset.count() if rows < threshold else rows
 
 
 class NamespacedPaginator(Paginator):
@@ -6,36 +118,290 @@ class NamespacedPaginator(Paginator):
     """
         Add simple namespacing to the default django Paginator
         and adding pagination helpers
+
+        count_function - Optional callable taking the object list and
+                         returning its count, used in place of a plain
+                         count() to cache or estimate it.
     """
     def __init__(self, object_list, per_page, orphans=0,
-                 allow_empty_first_page=True, namespace=None, current_page=1):
+                 allow_empty_first_page=True, namespace=None, current_page=1,
+                 count_function=None):
 
         super(NamespacedPaginator, self).__init__(
             object_list, per_page, orphans, allow_empty_first_page)
 
         self.ns = namespace
         self.current_page = int(current_page)
+        self.count_function = count_function
+
+    def _get_count(self):
+        if self._count is None and self.count_function is not None:
+            self._count = self.count_function(self.object_list)
+        return super(NamespacedPaginator, self)._get_count()
+    count = property(_get_count)
 
     def pages(self):
         """
         returns a list of pages that the template can understand to render
         itself correctly.
         """
-        all_pages = self._get_page_range()
-        if len(all_pages) <= 10:
-            return all_pages
+        num_pages = self.num_pages
+        if num_pages <= 10:
+            return range(1, num_pages + 1)
         else:
             start = max(self.current_page - 4, 1)
-            end = min(start + 8, len(all_pages))
+            end = min(start + 8, num_pages)
             if start == 1:
-                return all_pages[0:end + 1] + [None]
-            elif end == len(all_pages):
-                return [None] + all_pages[-9:]
+                return range(1, min(end + 1, num_pages) + 1) + [None]
+            elif end == num_pages:
+                return [None] + range(num_pages - 8, num_pages + 1)
             else:
-                return [None] + all_pages[start - 1:end] + [None]
+                return [None] + range(start, end + 1) + [None]
+
+
+class CountlessPaginator(NamespacedPaginator):
+
+    """
+        A NamespacedPaginator that never counts.  Each page fetches one row
+        more than it shows to find out whether there's a next page, so only
+        pages up to the next one are known to exist.  ``count`` is ``None``
+        and ``num_pages`` is the furthest page known to exist.
+    """
+    def __init__(self, *args, **kwargs):
+        super(CountlessPaginator, self).__init__(*args, **kwargs)
+        self.has_next = False
+        self.last_known_page = 1
+
+    def _get_count(self):
+        return None
+    count = property(_get_count)
+
+    def _get_num_pages(self):
+        return self.last_known_page
+    num_pages = property(_get_num_pages)
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            # count no further than this page, so num_pages is the last
+            # page to fall back on
+            head = self.object_list[:bottom]
+            try:
+                available = head.count()
+            except (AttributeError, TypeError):
+                available = len(head)
+            self.has_next = False
+            self.last_known_page = max(
+                int(math.ceil(available / float(self.per_page))), 1)
+            raise EmptyPage('That page contains no results')
+
+        has_next = len(rows) > self.per_page
+        self.current_page = number
+        self.has_next = has_next
+        self.last_known_page = number + 1 if has_next else number
+        return CountlessPage(rows[:self.per_page], number, self, has_next)
+
+    def pages(self):
+        start = max(self.current_page - 4, 1)
+        pages = range(start, self.last_known_page + 1)
+        return (([None] if start > 1 else []) + pages +
+                ([None] if self.has_next else []))
+
+
+class CountlessPage(Page):
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super(CountlessPage, self).__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1
 
 
 class MockPage(object):
 
     def __init__(self, object_list):
         self.object_list = object_list
+
+
+class FrozenPaginator(object):
+
+    """
+        Picklable snapshot of what the templates need from a paginator.
+    """
+    def __init__(self, paginator):
+        self.ns = paginator.ns
+        self.per_page = paginator.per_page
+        self.current_page = paginator.current_page
+        self.count = getattr(paginator, 'count', None)
+        self.num_pages = getattr(paginator, 'num_pages', None)
+        self._pages = paginator.pages()
+
+    def pages(self):
+        return self._pages
+
+
+class FrozenPage(object):
+
+    """
+        Picklable snapshot of an evaluated page, used to cache it.
+    """
+    def __init__(self, page):
+        self.object_list = list(page.object_list)
+        self.number = page.number
+        self.paginator = FrozenPaginator(page.paginator)
+        self._has_next = page.has_next()
+        self._has_previous = page.has_previous()
+        self._next = page.next_page_number() if self._has_next else None
+        self._previous = (page.previous_page_number()
+                          if self._has_previous else None)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def next_page_number(self):
+        return self._next
+
+    def previous_page_number(self):
+        return self._previous
+
+
+def freeze_page(page):
+    if not hasattr(page, 'paginator'):
+        return MockPage(list(page.object_list))
+    return FrozenPage(page)
+
+
+class KeysetPaginator(object):
+
+    """
+        Cursor based alternative to the NamespacedPaginator.  Rather than
+        counting and offsetting, each page seeks from the sort key and primary
+        key of the row bordering it, so deep pages cost the same as the
+        first one.
+
+        The current "page" is an opaque cursor token, which is handed out by
+        the page's next_page_number and previous_page_number, so the
+        pagination controls only offer previous / next links.
+
+        ordering - The order_by string of the active sort, e.g. '-created'.
+                   The primary key is always added as a tie breaker.  The
+                   sort field should not be nullable.
+    """
+    def __init__(self, object_list, per_page, namespace=None,
+                 current_page=None, ordering=None):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ns = namespace
+        self.current_page = current_page
+        self.ordering = ordering or 'pk'
+        self.descending = self.ordering.startswith('-')
+        self.sort_field = self.ordering.lstrip('-')
+        self.sort_key = compile_chain(split_chain(self.sort_field), getattr)
+
+    def pages(self):
+        return []
+
+    def encode_cursor(self, direction, obj):
+        value = encode_value(self.sort_key(obj))
+        data = json.dumps([direction, self.ordering, value,
+                           encode_value(obj.pk)])
+        return base64.urlsafe_b64encode(data)
+
+    def decode_cursor(self, cursor):
+        """
+        Returns a ``(direction, value, pk)`` tuple, or ``None`` for the
+        first page, an invalid cursor or one issued for another ordering.
+        """
+        try:
+            direction, ordering, value, pk = json.loads(
+                base64.urlsafe_b64decode(str(cursor)))
+            if ordering != self.ordering or direction not in ('n', 'p'):
+                return None
+            return direction, decode_value(value), decode_value(pk)
+        except (TypeError, ValueError):
+            return None
+
+    def order(self, queryset, forward):
+        prefix = '-' if forward == self.descending else ''
+        if self.sort_field == 'pk':
+            return queryset.order_by('%spk' % prefix)
+        return queryset.order_by('%s%s' % (prefix, self.sort_field),
+                                 '%spk' % prefix)
+
+    def seek(self, queryset, value, pk, forward):
+        op = 'gt' if forward != self.descending else 'lt'
+        if self.sort_field == 'pk':
+            return queryset.filter(**{'pk__%s' % op: pk})
+        return queryset.filter(
+            Q(**{'%s__%s' % (self.sort_field, op): value}) |
+            Q(**{self.sort_field: value, 'pk__%s' % op: pk}))
+
+    def page(self, cursor=None):
+        position = self.decode_cursor(cursor) if cursor else None
+        forward = position is None or position[0] == 'n'
+
+        qs = self.order(self.object_list, forward)
+        if position is not None:
+            qs = self.seek(qs, position[1], position[2], forward)
+
+        rows = list(qs[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if forward:
+            return KeysetPage(rows, self, has_next=has_more,
+                              has_previous=position is not None)
+        rows.reverse()
+        return KeysetPage(rows, self, has_next=True, has_previous=has_more)
+
+
+class KeysetPage(object):
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.number = None
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        return self.paginator.encode_cursor('n', self.object_list[-1])
+
+    def previous_page_number(self):
+        return self.paginator.encode_cursor('p', self.object_list[0])
@@ -0,0 +1,443 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, router, transaction
+from django.db.models.fields import FieldDoesNotExist
+from django.db.models.fields.related import ForeignKey, OneToOneField
+
+from .column import split_chain
+
+SELECT = 'select'
+PREFETCH = 'prefetch'
+FIELD = 'field'
+
+ONLY = 'only'
+VALUES = 'values'
+
+
+def get_field_kind(model, name):
+    """
+    Work out what the attribute ``name`` of ``model`` is in database terms.
+
+    Returns a ``(kind, related_model)`` tuple, where kind is ``FIELD`` for
+    concrete non relational fields, ``SELECT`` for relations that can be
+    joined with select_related (forward foreign keys and one to ones in
+    either direction), ``PREFETCH`` for relations that need
+    prefetch_related (reverse foreign keys and many to manys), or ``None``
+    if the attribute isn't known to the ORM at all (properties, methods,
+    annotations).
+    """
+    opts = model._meta
+    try:
+        field, _, direct, m2m = opts.get_field_by_name(name)
+    except FieldDoesNotExist:
+        field = None
+
+    if field is not None and direct:
+        rel = getattr(field, 'rel', None)
+        if rel is None:
+            return (FIELD if getattr(field, 'column', None) else None), None
+        if not hasattr(rel, 'to'):
+            return None, None
+        return (PREFETCH if m2m else SELECT), rel.to
+
+    # Reverse relations are reached through their accessor name, e.g.
+    # ``entry_set``, rather than their query name.
+    for rel in opts.get_all_related_objects():
+        if rel.get_accessor_name() == name:
+            kind = SELECT if isinstance(rel.field, OneToOneField) else PREFETCH
+            return kind, rel.model
+    for rel in opts.get_all_related_many_to_many_objects():
+        if rel.get_accessor_name() == name:
+            return PREFETCH, rel.model
+    return None, None
+
+
+def get_relation(model, name):
+    """
+    Like ``get_field_kind``, but only reports relations.  Returns a
+    ``(kind, related_model)`` tuple where kind is ``SELECT``, ``PREFETCH`` or
+    ``None``.
+    """
+    kind, related_model = get_field_kind(model, name)
+    return (None, None) if kind == FIELD else (kind, related_model)
+
+
+def lookup_models(model, lookups):
+    """
+    The models reached by following each of the related ``lookups`` (as
+    returned by ``related_lookups``) from ``model``, in order of discovery.
+    """
+    models = []
+    for lookup in lookups:
+        current = model
+        for name in lookup.split('__'):
+            kind, current = get_relation(current, name)
+            if kind is None:
+                break
+            if current not in models:
+                models.append(current)
+    return models
+
+
+def attname_for(model, names):
+    """
+    If the chain ``names`` is a foreign key followed by the field it points
+    at, e.g. ``['participant', 'id']``, returns the attname holding that
+    value on ``model`` itself (``participant_id``), so the related object
+    never has to be loaded.  Otherwise returns ``None``.
+    """
+    opts = getattr(model, '_meta', None)
+    if opts is None or len(names) != 2:
+        return None
+    try:
+        field = opts.get_field_by_name(names[0])[0]
+    except FieldDoesNotExist:
+        return None
+    if not isinstance(field, ForeignKey):
+        return None
+
+    target = field.rel.get_related_field()
+    if names[1] == target.name or (names[1] == 'pk' and target.primary_key):
+        return field.attname
+    return None
+
+
+def chain_field(model, names):
+    """
+    The concrete, non relational field the chain ``names`` ends on when
+    followed from ``model`` through forward relations, or ``None``.
+    """
+    for i, name in enumerate(names):
+        kind, related_model = get_field_kind(model, name)
+        if kind == FIELD and i == len(names) - 1:
+            return model._meta.get_field_by_name(name)[0]
+        elif kind != SELECT or not _is_forward(model, name):
+            return None
+        model = related_model
+    return None
+
+
+def related_lookups(model, chains, explicit=(), url_chains=()):
+    """
+    Build the select_related and prefetch_related lookups needed to follow
+    each accessor chain (a list of attribute names) from ``model`` without
+    lazily loading related objects row by row.
+
+    ``explicit`` lookups are classified the same way, but when they can't be
+    resolved against the model they're handed to prefetch_related as given.
+    ``url_chains`` are url arguments, which need nothing when they can be
+    read off a foreign key's attname.
+
+    Returns a ``(select, prefetch)`` tuple of sorted lookup lists.
+    """
+    select, prefetch = set(), set()
+
+    def walk(names):
+        current = model
+        path, select_path = [], None
+        for name in names:
+            kind, current = get_relation(current, name)
+            if kind is None:
+                break
+            path.append(name)
+            if kind == PREFETCH and select_path is None:
+                select_path = path[:-1]
+        else:
+            return path, select_path, True
+        return path, select_path, False
+
+    url_chains = [names for names in url_chains
+                  if attname_for(model, names) is None]
+    for names in list(chains) + url_chains:
+        path, select_path, _ = walk(names)
+        if select_path is None:
+            if path:
+                select.add('__'.join(path))
+        else:
+            if select_path:
+                select.add('__'.join(select_path))
+            prefetch.add('__'.join(path))
+
+    for lookup in explicit:
+        path, select_path, resolved = walk(split_chain(lookup))
+        if not resolved or select_path is not None:
+            prefetch.add(lookup.replace('.', '__'))
+        else:
+            select.add('__'.join(path))
+
+    return sorted(select), sorted(prefetch)
+
+
+def _is_forward(model, name):
+    try:
+        return model._meta.get_field_by_name(name)[2]
+    except FieldDoesNotExist:
+        return False
+
+
+def projected_lookups(model, chains, mode=ONLY, url_chains=()):
+    """
+    Derive the database lookups needed to follow each accessor chain from
+    ``model``, for use with ``only()`` (``ONLY`` mode) or ``values_list()``
+    (``VALUES`` mode).
+
+    A chain contributes the forward relations it walks through and the
+    concrete field it ends on, so ``created.date`` needs ``created`` and
+    ``participant__full_name`` needs ``participant`` and
+    ``participant__full_name``.  Names the ORM doesn't know about are
+    properties, methods or annotations; in ``ONLY`` mode they are skipped,
+    since annotations are always loaded and properties must declare their
+    fields through ``Column(depends=...)``.  ``VALUES`` mode can't fall back
+    on the model at all, so a leading unknown name that isn't an attribute
+    of the model is taken to be an annotation, and anything else that can't
+    be expressed as a single column, such as a method or property, raises
+    ImproperlyConfigured.  ``url_chains`` are treated the
+    same, except that in ``ONLY`` mode the ones read off a foreign key's
+    attname just need the foreign key.
+    """
+    lookups = []
+
+    def add(lookup):
+        if lookup not in lookups:
+            lookups.append(lookup)
+
+    chains = list(chains)
+    for names in url_chains:
+        if mode == ONLY and attname_for(model, names) is not None:
+            add(names[0])
+        else:
+            chains.append(names)
+
+    for names in chains:
+        current = model
+        path = []
+        for i, name in enumerate(names):
+            kind, related_model = get_field_kind(current, name)
+            if kind == FIELD:
+                add('__'.join(path + [name]))
+                break
+            elif kind == SELECT:
+                path.append(name)
+                if mode == ONLY and _is_forward(current, name):
+                    # only() needs the foreign key itself to keep the join
+                    add('__'.join(path))
+                current = related_model
+            elif kind == PREFETCH:
+                if mode == VALUES:
+                    raise ImproperlyConfigured(
+                        "'%s' follows a multi-valued relation and can't be "
+                        "projected with values_list()" % '.'.join(names))
+                break
+            else:
+                if mode == VALUES:
+                    if name == 'pk':
+                        add('__'.join(path + [name]))
+                    elif i == 0 and not hasattr(model, name):
+                        # an annotation
+                        add(name)
+                    else:
+                        raise ImproperlyConfigured(
+                            "'%s' isn't a database field of %s and can't be "
+                            "projected with values_list(); use a callable "
+                            "accessor with depends instead"
+                            % ('.'.join(names), current.__name__))
+                elif path:
+                    # a method or property of a related object, which may
+                    # use any of its fields.
+                    add('__'.join(path))
+                break
+        else:
+            if path:
+                # the chain ends on a relation, e.g. a foreign key column
+                add('__'.join(path))
+    return lookups
+
+
+class ProjectedRow(object):
+    """
+    Bare attribute container standing in for a model instance when a table
+    is projected with ``values_list()``.  Related lookups become nested
+    rows, so accessor chains such as ``participant.full_name`` keep working.
+    """
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+    def __repr__(self):
+        return '<ProjectedRow: %r>' % self.__dict__
+
+
+def row_factory(lookups):
+    """
+    Compile the values_list() lookups into a function building a
+    ``ProjectedRow`` from each result tuple.
+    """
+    tree = {}
+    for index, lookup in enumerate(lookups):
+        node = tree
+        names = lookup.split('__')
+        for name in names[:-1]:
+            child = node.get(name)
+            if not isinstance(child, dict):
+                # a nested lookup wins over the bare foreign key value
+                child = node[name] = {}
+            node = child
+        node.setdefault(names[-1], index)
+
+    def compile_node(node):
+        leaves = [(k, v) for k, v in node.items() if not isinstance(v, dict)]
+        children = [(k, compile_node(v)) for k, v in node.items()
+                    if isinstance(v, dict)]
+
+        def build(values):
+            row = ProjectedRow()
+            d = row.__dict__
+            for name, index in leaves:
+                d[name] = values[index]
+            for name, child in children:
+                d[name] = child(values)
+            return row
+        return build
+
+    return compile_node(tree)
+
+
+class ProjectedQuerySet(object):
+    """
+    Wraps a ``values_list()`` queryset so that it yields ``ProjectedRow``
+    objects, while still counting and slicing lazily in the database for the
+    paginator.  Counts run against ``count_queryset`` when given, so they
+    aren't wrapped around the projected columns.
+    """
+    def __init__(self, queryset, factory, count_queryset=None):
+        self.queryset = queryset
+        self.factory = factory
+        self.count_queryset = count_queryset
+
+    def all(self):
+        return ProjectedQuerySet(self.queryset.all(), self.factory,
+                                 self.count_queryset)
+
+    def filter(self, *args, **kwargs):
+        return self._chain('filter', *args, **kwargs)
+
+    def order_by(self, *field_names):
+        return self._chain('order_by', *field_names)
+
+    def _chain(self, method, *args, **kwargs):
+        count_qs = self.count_queryset
+        if count_qs is not None:
+            count_qs = getattr(count_qs, method)(*args, **kwargs)
+        return ProjectedQuerySet(
+            getattr(self.queryset, method)(*args, **kwargs), self.factory,
+            count_qs)
+
+    def count(self):
+        if self.count_queryset is not None:
+            return self.count_queryset.count()
+        return self.queryset.count()
+
+    def __len__(self):
+        return len(self.queryset)
+
+    def __iter__(self):
+        factory = self.factory
+        for values in self.queryset:
+            yield factory(values)
+
+    def iterator(self):
+        factory = self.factory
+        for values in self.queryset.iterator():
+            yield factory(values)
+
+    def __getitem__(self, n):
+        if isinstance(n, slice):
+            return ProjectedQuerySet(self.queryset[n], self.factory)
+        return self.factory(self.queryset[n])
+
+
+def bulk_update(model, objects, fields, batch_size=None):
+    """
+    Write ``fields`` (attnames of ``model``'s own table) of ``objects``
+    without calling ``save()`` or sending signals, in a single transaction
+    of one ``UPDATE ... SET field = CASE pk WHEN ... END WHERE pk IN (...)``
+    per ``batch_size`` objects.  Batches default to as many objects as fit
+    in 900 query parameters, under SQLite's limit.
+    """
+    if not objects or not fields:
+        return
+    opts = model._meta
+    using = router.db_for_write(model)
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    pk = opts.pk
+    attnames = dict((f.attname, f) for f in opts.local_fields)
+    targets = [attnames[f] for f in fields]
+    if batch_size is None:
+        # each object binds its key once per field and once for the IN
+        batch_size = max(900 // (2 * len(targets) + 1), 1)
+
+    def placeholder(field):
+        # PostgreSQL types the branches of a CASE as text unless told
+        db_type = field.db_type(connection)
+        if connection.vendor == 'postgresql' and db_type:
+            return 'CAST(%%s AS %s)' % db_type
+        return '%s'
+
+    with transaction.atomic(using=using):
+        cursor = connection.cursor()
+        for start in range(0, len(objects), batch_size):
+            batch = objects[start:start + batch_size]
+            keys = [pk.get_db_prep_value(obj.pk, connection)
+                    for obj in batch]
+            assignments, params = [], []
+            for field in targets:
+                when = 'WHEN %%s THEN %s' % placeholder(field)
+                assignments.append('%s = CASE %s %s END' % (
+                    qn(field.column), qn(pk.column),
+                    ' '.join([when] * len(batch))))
+                for key, obj in zip(keys, batch):
+                    params.append(key)
+                    params.append(field.get_db_prep_save(
+                        getattr(obj, field.attname), connection=connection))
+            cursor.execute('UPDATE %s SET %s WHERE %s IN (%s)' % (
+                qn(opts.db_table), ', '.join(assignments), qn(pk.column),
+                ', '.join(['%s'] * len(keys))), params + keys)
+
+
+def iter_chunks(queryset, size):
+    """
+    Iterate over ``queryset`` in lists of at most ``size`` rows without
+    filling its result cache.
+
+    Model querysets stream their primary keys, in the queryset's own order
+    (or primary key order for unordered querysets), and load each chunk of
+    objects with a single ``in_bulk`` query, so select_related and
+    prefetch_related lookups are still honoured per chunk.  Projected
+    querysets stream their tuples directly, and anything else is simply
+    iterated.
+    """
+    if hasattr(queryset, 'in_bulk') and queryset.query.can_filter():
+        if not queryset.ordered:
+            # give the key stream a stable order to page through
+            queryset = queryset.order_by('pk')
+        pks = queryset.values_list('pk', flat=True).iterator()
+        load = lambda batch: _load_chunk(queryset, batch)
+    elif hasattr(queryset, 'iterator'):
+        pks = queryset.iterator()
+        load = None
+    else:
+        pks = iter(queryset)
+        load = None
+
+    batch = []
+    for item in pks:
+        batch.append(item)
+        if len(batch) >= size:
+            yield load(batch) if load else batch
+            batch = []
+    if batch:
+        yield load(batch) if load else batch
+
+
+def _load_chunk(queryset, pks):
+    objects = queryset.in_bulk(pks)
+    return [objects[pk] for pk in pks if pk in objects]
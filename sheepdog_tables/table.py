@@ -1,14 +1,83 @@
-from inspect import getmembers
 from django.core.exceptions import ImproperlyConfigured
 from django.conf import settings
+from django.db.models import Count
 from django.forms.models import ModelForm, BaseModelFormSet
 from django.forms.formsets import formset_factory
+from django.utils import six
 from django.utils.translation import ugettext_lazy as _
 
-from .column import Column, ASC, DESC
+from .column import Column, ASC, DESC, TOTAL, PAGE, split_chain
+from .cache import model_version, watch
+from .paginator import OFFSET, KEYSET, EXACT
+from .query import (related_lookups, projected_lookups, lookup_models,
+                    row_factory, chain_field, ProjectedQuerySet, ONLY,
+                    VALUES)
 
 
-class Table(object):
+def bind_columns(columns):
+    """
+    Default each column's field to the name it was declared under and
+    compile its accessor.
+    """
+    for k, col in columns.items():
+        # Field becomes the key value if it isn't passed
+        # to the column explicitly
+        if not col.field:
+            col.field = k
+        col.compile_accessor()
+
+
+def build_maps(name, columns, sequence):
+    """
+    Check that every name in ``sequence`` is one of ``columns``, and return
+    the ``(headers, sort_columns)`` of the table, the latter mapping each
+    sort field to the first sortable column in the sequence using it.
+    """
+    missing = [h for h in sequence if h not in columns]
+    if missing:
+        raise ImproperlyConfigured(
+            '%s.table_sequence refers to undeclared columns: %s'
+            % (name, ', '.join(missing)))
+
+    headers = [columns[h].header or h.title() for h in sequence]
+    sort_columns = {}
+    for h in sequence:
+        if columns[h].sortable:
+            sort_columns.setdefault(columns[h].get_sort_field(), columns[h])
+    return headers, sort_columns
+
+
+class TableMetaclass(type):
+    """
+    Collects the columns declared on a table class and its bases into
+    ``base_columns`` when the class is created, and validates
+    ``table_sequence`` against them, so configuration errors surface at
+    import time rather than on the first request.  A base's column can be
+    removed by setting the attribute to something other than a ``Column``.
+    """
+    def __new__(mcs, name, bases, attrs):
+        cls = super(TableMetaclass, mcs).__new__(mcs, name, bases, attrs)
+
+        columns = {}
+        for klass in reversed(cls.__mro__):
+            for k, v in vars(klass).items():
+                if isinstance(v, Column):
+                    columns[k] = v
+                elif k in columns:
+                    del columns[k]
+        bind_columns(columns)
+
+        cls.base_columns = columns
+        # getattr, as older versions of six.with_metaclass also call this on
+        # a bare ``NewBase`` helper class
+        cls._headers, cls._sort_columns = build_maps(
+            name, columns, getattr(cls, 'table_sequence', None) or [])
+        if getattr(cls, 'table_cache_timeout', None):
+            watch()
+        return cls
+
+
+class Table(six.with_metaclass(TableMetaclass, object)):
     """
     Generic table base class
 
@@ -31,74 +100,388 @@ class Table(object):
 
     table_empty - String to print if no data is available
 
-    table_sequence - The explicit sequence of columns to show.
+    table_unavailable - String to print instead when the table's page
+                    couldn't be fetched (see ``TablesMixin.table_timeout``)
+
+    table_sequence - The explicit sequence of columns to show.  It's checked
+                    against the declared columns when the class is created.
+
+    table_related - Whether to apply the select_related / prefetch_related
+                    lookups inferred from the columns in ``table_sequence``.
+                    See the ``related`` argument of ``Column`` to override
+                    them per column.
+
+    table_projection - Opt in to loading only what the displayed columns
+                    need.  ``'only'`` restricts the queryset with ``only()``
+                    to the fields derived from the columns, while
+                    ``'values'`` skips model instances entirely and feeds
+                    ``values_list()`` rows to the columns.  Columns with
+                    callable accessors or property based chains should
+                    declare the fields they read with ``Column(depends=...)``.
+                    Not meant for use with ``EditTable``.
+
+    table_pagination - ``'offset'`` pages with the ``NamespacedPaginator``,
+                    while ``'keyset'`` uses the ``KeysetPaginator`` to seek
+                    from the active sort column and primary key instead,
+                    keeping deep pages as fast as the first one.
+
+    table_count - How offset pagination counts the rows.  ``'exact'`` runs a
+                    ``COUNT(*)`` every time, ``'cached'`` caches it for
+                    ``table_count_timeout`` seconds per namespace and
+                    filter, ``'estimated'`` uses the PostgreSQL planner's
+                    estimate for large results, and ``'countless'`` never
+                    counts, only offering the pages around the current one.
+
+    table_row_renderer - Optional ``RowRenderer`` class (see render.py) used by
+                    table.html to render the body rows in one pass in Python
+                    rather than through a template include per row.
+
+    table_cache_timeout - Opt in to caching the table's evaluated page (and
+                    its HTML when rendered with ``{% render_table %}``) for
+                    this many seconds.  Entries are keyed on the table,
+                    namespace, page and the queryset's SQL, which covers the
+                    sort and filters, plus the data version returned by
+                    ``get_cache_version``.  That covers saves and deletes
+                    of the model and of the related models the columns
+                    display, but not changes made with ``update()``, raw SQL
+                    or other models an annotation reads; override
+                    ``get_cache_version`` for those.  See
+                    ``cache.watch`` for saves made in other processes.
     """
     table_page_limit = getattr(settings, 'DEFAULT_ITEMS_PER_PAGE', 25)
     table_attrs = {'class': 'table table-bordered table-striped'}
     table_empty = _("No data is available")
+    table_unavailable = _("This table could not be loaded")
     table_sequence = []
+    table_related = True
+    table_projection = None
+    table_pagination = OFFSET
+    table_count = EXACT
+    table_count_timeout = 300
+    table_row_renderer = None
+    table_cache_timeout = None
 
     def __init__(self, is_paged=True):
         if not self.table_sequence:
             raise ImproperlyConfigured('%s does not provide a table_sequence.'
                                        % self.__class__.__name__)
-        self.table_columns = {}
         self.is_paged = is_paged
+        self._related_lookups = {}
+        self._projected_lookups = {}
+        self._row_renderer = None
         self.gen_columns()
 
     def gen_columns(self):
-        # l(k) -> class.__dict__[k]
-        members_dict = dict(getmembers(self))
-        l = lambda k: members_dict[k]
-        # Extract the columns into our own nifty dict for later
-        for k in members_dict.keys():
-            if isinstance(l(k), Column):
-                # Field becomes the key value if it isn't passed
-                # to the column explicitly
-                if not l(k).field:
-                    l(k).field = k
-                self.table_columns[k] = l(k)
+        # Columns are collected once per class by TableMetaclass, so only
+        # columns or a sequence set on the instance need any work here.
+        self.table_columns = dict(self.base_columns)
+        extra = dict((k, v) for k, v in vars(self).items()
+                     if isinstance(v, Column))
+        if extra or 'table_sequence' in vars(self):
+            bind_columns(extra)
+            self.table_columns.update(extra)
+            self._headers, self._sort_columns = build_maps(
+                self.__class__.__name__, self.table_columns,
+                self.table_sequence)
 
     def filter(self, queryset):
         return queryset
 
     def annotate(self, queryset):
-        cols = self.table_columns
-        annotated_columns = [col for col in cols
-                             if cols[col].annotation is not None]
+        """
+        Apply the annotations of the displayed columns, except for those
+        computed per page (see ``annotate_page``).
+        """
+        for col in self.columns():
+            if col.annotation is not None and not col.page_annotation:
+                queryset = col.annotation(queryset)
 
-        for col in annotated_columns:
-            queryset = cols[col].annotation(queryset)
+        return queryset
 
+    def annotate_page_columns(self, queryset):
+        """
+        Apply the annotations of the displayed columns computed per page to
+        the whole of ``queryset``, as exports need on top of ``annotate``.
+        """
+        for col in self.columns():
+            if col.annotation is not None and col.page_annotation:
+                queryset = col.annotation(queryset)
+        return queryset
+
+    def annotate_count(self, queryset):
+        """
+        The queryset to count the table's rows with: ``queryset`` with only
+        the annotations that may change which rows it returns.  Page
+        annotations never do.
+        """
+        for col in self.columns():
+            if (col.annotation is not None and col.annotation_filters and
+                    not col.page_annotation):
+                queryset = col.annotation(queryset)
         return queryset
 
+    def annotate_page(self, object_list, model):
+        """
+        Compute the page annotations of the displayed columns for the
+        objects of ``object_list`` alone, in one query keyed on their
+        primary keys, and set the values on them.  ``object_list`` must be
+        a list.
+        """
+        columns = [col for col in self.columns()
+                   if col.annotation is not None and col.page_annotation]
+        if not columns or not object_list or model is None:
+            return
+
+        names = []
+        for col in columns:
+            for chain in col.accessor_chains():
+                if chain[0] not in names:
+                    names.append(chain[0])
+
+        queryset = model._default_manager.filter(
+            pk__in=[obj.pk for obj in object_list])
+        for col in columns:
+            queryset = col.annotation(queryset)
+        rows = dict((row[0], row[1:]) for row in
+                    queryset.order_by().values_list('pk', *names))
+
+        missing = (None,) * len(names)
+        for obj in object_list:
+            for name, value in zip(names, rows.get(obj.pk, missing)):
+                setattr(obj, name, value)
+
+    def resolve_batches(self, objects):
+        """
+        Resolve the displayed columns that have a ``batch`` for ``objects``,
+        a column at a time.  Returns ``objects`` as is if there are none,
+        and otherwise as a list holding the values.
+        """
+        columns = [col for col in self.columns() if col.batch is not None]
+        if not columns:
+            return objects
+        objects = list(objects)
+        if objects:
+            for col in columns:
+                col.resolve_batch(objects)
+        return objects
+
+    def aggregate(self, queryset, scope, count=False):
+        """
+        Compute the footer aggregates of the displayed columns for ``scope``
+        over ``queryset`` (as built by ``annotate_count``) in a single
+        ``aggregate()`` query, which also counts the rows with ``count``.
+        Returns a ``(values, count)`` tuple, with the values keyed on column
+        name and the count ``None`` unless asked for.
+        """
+        aggregates = {}
+        for key in self.table_sequence:
+            col = self.table_columns[key]
+            if col.aggregates_in(scope):
+                if col.annotation is not None and (
+                        not col.annotation_filters or col.page_annotation):
+                    # not already applied by annotate_count
+                    queryset = col.annotation(queryset)
+                # prefixed, so they can't replace an annotation of the name
+                aggregates['footer_%s' % key] = col.get_aggregate()
+        if count:
+            # not 'pk', which aggregating over annotations can't resolve
+            aggregates['row_count'] = Count(queryset.model._meta.pk.name)
+        if not aggregates:
+            return {}, None
+
+        result = queryset.order_by().aggregate(**aggregates)
+        values = dict((key, result['footer_%s' % key])
+                      for key in self.table_sequence
+                      if 'footer_%s' % key in result)
+        return values, result.get('row_count')
+
+    def aggregate_page(self, object_list, queryset):
+        """
+        Compute the page scoped footer aggregates over the rows of
+        ``queryset`` (as built by ``annotate_count``) shown in
+        ``object_list``, in one query keyed on their primary keys.
+        """
+        return self.aggregate(
+            queryset.filter(pk__in=[obj.pk for obj in object_list]),
+            PAGE)[0]
+
+    def has_footer(self, scope=None):
+        return any(col.aggregates_in(scope) if scope else
+                   col.aggregate is not None for col in self.columns())
+
+    def footer_rows(self, page_values=None, total_values=None):
+        """
+        The footer rows for the aggregates of each scope that was computed,
+        as dicts with the ``scope`` and a ``cells`` list holding a value per
+        displayed column.  The first cell names the row when its column
+        isn't aggregated.
+        """
+        rows = []
+        for scope, label, values in ((PAGE, _('Page'), page_values),
+                                     (TOTAL, _('Total'), total_values)):
+            if values is None:
+                continue
+            cells = []
+            for key in self.table_sequence:
+                if key in values:
+                    cells.append(
+                        self.table_columns[key].footer_value(values[key]))
+                else:
+                    cells.append('' if cells else label)
+            rows.append({'scope': scope, 'cells': cells})
+        return rows
+
+    def related_lookups(self, model):
+        """
+        Returns the ``(select_related, prefetch_related)`` lookups needed to
+        render the displayed columns for ``model``.
+        """
+        if model not in self._related_lookups:
+            chains, explicit, url_chains = [], [], []
+            for col in self.columns():
+                if col.related is None:
+                    chains.extend(col.accessor_chains())
+                    url_chains.extend(col.url_chains())
+                elif col.related:
+                    explicit.extend(col.related)
+            self._related_lookups[model] = related_lookups(
+                model, chains, explicit, url_chains)
+        return self._related_lookups[model]
+
+    def fetch_related(self, queryset):
+        model = getattr(queryset, 'model', None)
+        if not self.table_related or model is None:
+            return queryset
+
+        select, prefetch = self.related_lookups(model)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+    def projected_lookups(self, model, page_annotations=False):
+        """
+        Returns the lookups to load for ``model`` under ``table_projection``,
+        or ``None`` if a column reads data the table can't account for.
+        Page annotations are only loaded with ``page_annotations``, as for
+        ``annotate``.
+        """
+        key = (model, page_annotations)
+        if key not in self._projected_lookups:
+            columns = self.columns()
+            if any(hasattr(col.accessor, '__call__') and col.depends is None
+                   for col in columns):
+                if self.table_projection == VALUES:
+                    raise ImproperlyConfigured(
+                        '%s uses values projection, but has callable '
+                        'accessors without depends.' % self.__class__.__name__)
+                lookups = None
+            else:
+                chains, url_chains = [], []
+                for col in columns:
+                    if page_annotations or not col.page_annotation:
+                        # otherwise filled in after the page is fetched
+                        chains.extend(col.accessor_chains())
+                    url_chains.extend(col.url_chains())
+                lookups = projected_lookups(model, chains,
+                                            self.table_projection, url_chains)
+                if self.table_projection == VALUES:
+                    # rows carry their key, and their sort keys when
+                    # paging with a cursor.
+                    extra = ['pk']
+                    if self.table_pagination == KEYSET:
+                        extra.extend(col.get_sort_field() for col in columns
+                                     if col.sortable)
+                    lookups.extend(l for l in extra if l not in lookups)
+            self._projected_lookups[key] = lookups
+        return self._projected_lookups[key]
+
+    def project(self, queryset, page_annotations=False):
+        model = getattr(queryset, 'model', None)
+        if not self.table_projection or model is None:
+            return queryset
+
+        lookups = self.projected_lookups(model, page_annotations)
+        if lookups is None:
+            return queryset
+        elif self.table_projection == ONLY:
+            return queryset.only(*lookups)
+        else:
+            values_qs = queryset.prefetch_related(None).values_list(*lookups)
+            return ProjectedQuerySet(values_qs, row_factory(lookups),
+                                     count_queryset=queryset)
+
+    def export_fields(self, model):
+        """
+        The model field behind each displayed column, for exporters that
+        type their columns, or ``None`` for the columns that aren't a plain
+        field of ``model`` (callables, batches, annotations, relations).
+        """
+        fields = []
+        for col in self.columns():
+            if (model is None or col.batch is not None or
+                    hasattr(col.accessor, '__call__')):
+                fields.append(None)
+            else:
+                fields.append(chain_field(
+                    model, split_chain(col.accessor or col.field)))
+        return fields
+
+    def get_row_renderer(self):
+        if self._row_renderer is None:
+            self._row_renderer = self.table_row_renderer(self)
+        return self._row_renderer
+
+    def get_cache_version(self, queryset):
+        """
+        The data version cached pages are keyed on.  Defaults to the
+        counters bumped whenever an instance of the model, or of a model
+        the columns follow a relation to (see ``related_lookups``), is saved
+        or deleted; override it to use something like
+        ``cache.latest_version``.
+        """
+        model = getattr(queryset, 'model', None)
+        if model is None:
+            return None
+        select, prefetch = self.related_lookups(model)
+        models = [model] + lookup_models(model, select + prefetch)
+        return '.'.join(str(model_version(m)) for m in models)
+
     def columns(self):
         return [self.table_columns[h] for h in self.table_sequence]
 
     def headers(self):
-        return [self.table_columns[h].header or h.title()
-                for h in self.table_sequence]
+        return list(self._headers)
 
     def parse_sort(self, sortstring):
         direction = DESC if sortstring[0] == '-' else ASC
         field = sortstring if direction == ASC else sortstring[1:]
         return field, direction
 
-    def sort(self, queryset, sort_string):
+    def get_sort_column(self, sort_string):
+        """
+        Returns the sortable column and direction ``sort_string`` refers to,
+        or ``(None, None)`` if it doesn't match one.
+        """
         if not sort_string:
-            return queryset
+            return None, None
 
         sort_field, direction = self.parse_sort(sort_string)
-        sorting_col = None
-        for col in self.columns():
-            if col.sortable and col.get_sort_field() == sort_field:
-                sorting_col = col
-                break
+        col = self._sort_columns.get(sort_field)
+        return (col, direction) if col is not None else (None, None)
 
-        if not sorting_col:
+    def get_ordering(self, sort_string):
+        sorting_col, direction = self.get_sort_column(sort_string)
+        return sorting_col.render_sort(direction) if sorting_col else None
+
+    def sort(self, queryset, sort_string):
+        ordering = self.get_ordering(sort_string)
+
+        if not ordering:
             return queryset
         else:
-            return queryset.order_by(sorting_col.render_sort(direction))
+            return queryset.order_by(ordering)
 
 
 class EditTable(Table):
@@ -106,9 +489,18 @@ class EditTable(Table):
     The only enhancements required to the Table data structure is the
     addition of the `table_form` and `table_formset` which are used to bind
     the FormSet class consumed by the view mixin.
+
+    Setting `table_bulk_save` makes the view write only the changed rows,
+    and only their editable fields, in one transaction with a single
+    ``UPDATE`` per few hundred rows, instead of saving every form.  Rows
+    are written without calling ``save()`` or sending ``post_save``, so
+    it's best kept to tables whose models don't rely on them.
     """
     table_form = ModelForm
     table_formset = BaseModelFormSet
+    # formsets need a live queryset, not a cached page
+    table_cache_timeout = None
+    table_bulk_save = False
 
     def __init__(self, *args, **kwargs):
 
@@ -120,3 +512,15 @@ class EditTable(Table):
                                        extra=0, max_num=0, can_order=False,
                                        can_delete=False)
         self.FormSet.model = self.table_form.Meta.model
+
+    def editable_fields(self):
+        """
+        The attnames of the concrete fields behind the editable columns,
+        plus any ``auto_now`` fields, which are what a bulk save writes.
+        Many to many fields are saved through their form.
+        """
+        opts = self.FormSet.model._meta
+        editable = set(c.field for c in self.table_columns.values()
+                       if c.editable)
+        return [f.attname for f in opts.local_fields
+                if f.name in editable or getattr(f, 'auto_now', False)]
@@ -27,12 +27,15 @@ class CallNode(template.Node):
             obj = context.get(self.obj, None)
 
             args = [context.get(arg, arg) for arg in self.args]
-            result = conditional_escape(getattr(obj, self.callable)(*args))
+            result = getattr(obj, self.callable)(*args)
 
             if self.var:
+                # Keep the object itself, so things like ColumnURLs can be
+                # used further down the template.
                 context[self.var] = result
+                return ''
 
-            return result
+            return conditional_escape(result)
 
         except template.VariableDoesNotExist:
             return ""
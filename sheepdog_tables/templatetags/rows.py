@@ -0,0 +1,104 @@
+from django import template
+from django.core.cache import cache
+from django.template.loader import get_template
+
+from sheepdog_tables.cache import record
+
+register = template.Library()
+
+"""
+Renders the body rows of a table through its ``table_row_renderer`` in one
+pass, in place of including tables/table_row.html for every row.
+
+Basic usage, with ``table`` being a table entry of the ``tables`` context:
+
+    {% render_rows table %}
+"""
+
+class RenderRowsNode(template.Node):
+    def __init__(self, table):
+        self.table = template.Variable(table)
+
+    def render(self, context):
+        try:
+            entry = self.table.resolve(context)
+        except template.VariableDoesNotExist:
+            return ''
+        renderer = entry['table'].get_row_renderer()
+        object_list = entry['page_obj'].object_list
+        timer = entry.get('timer')
+        if timer is None:
+            return renderer.render(object_list, context)
+        with timer.phase(entry['namespace'], 'rows') as timing:
+            timing['rows'] = len(object_list)
+            return renderer.render(object_list, context)
+
+
+def render_rows(parser, token):
+    try:
+        tag_name, table = token.split_contents()
+    except ValueError:
+        raise template.TemplateSyntaxError(
+            '%s requires 1 argument' % token.contents.split()[0])
+    return RenderRowsNode(table)
+
+register.tag('render_rows', render_rows)
+
+
+"""
+Renders a table entry with tables/table.html (or the template given), caching
+the HTML when the table has a ``table_cache_timeout``.
+
+Basic usage:
+
+    {% render_table tables.main_table %}
+    {% render_table tables.main_table "myapp/table.html" %}
+"""
+
+class RenderTableNode(template.Node):
+    def __init__(self, table, template_name):
+        self.table = template.Variable(table)
+        self.template_name = template_name
+
+    def render(self, context):
+        try:
+            entry = self.table.resolve(context)
+        except template.VariableDoesNotExist:
+            return ''
+        template_name = (self.template_name.resolve(context)
+                         if self.template_name else 'tables/table.html')
+        table = entry['table']
+
+        key = entry.get('cache_key')
+        if key is not None:
+            key = '%s:html:%s' % (key, template_name)
+            html = cache.get(key)
+            record(table.__class__.__name__, 'html', html is not None)
+            if html is not None:
+                return html
+
+        timer = entry.get('timer')
+        context.update({'table': entry})
+        try:
+            if timer is None:
+                html = get_template(template_name).render(context)
+            else:
+                with timer.phase(entry['namespace'], 'render'):
+                    html = get_template(template_name).render(context)
+        finally:
+            context.pop()
+
+        if key is not None:
+            cache.set(key, html, table.table_cache_timeout)
+        return html
+
+
+def render_table(parser, token):
+    bits = token.split_contents()
+    if len(bits) not in (2, 3):
+        raise template.TemplateSyntaxError(
+            '%s requires 1 or 2 arguments' % bits[0])
+    template_name = parser.compile_filter(bits[2]) if len(bits) == 3 else None
+    return RenderTableNode(bits[1], template_name)
+
+register.tag('render_table', render_table)
@@ -1,5 +1,6 @@
 from django import template
-from django.core.urlresolvers import reverse
+
+from ..links import build_url
 
 register = template.Library()
 
@@ -12,7 +13,8 @@ property of the passed object, and will use that property.  Otherwise
 it will just pass through the argument as is.
 
 The result is a URL, like /myapp/myobject/1/, generated at the end of
-the day, by django.core.urlresolvers.reverse
+the day, by django.core.urlresolvers.reverse (once per url, see
+sheepdog_tables.links)
 
 :params
 
@@ -34,20 +36,7 @@ class UrlBuilderNode(template.Node):
             url = context.get(self.url, None)
             obj = context.get(self.obj, None)
 
-            if url is None or obj is None:
-                return ''
-
-            arg_lists = [arg.split('.') for arg in url.args]
-            args = []
-            # TODO: Replace with resolve() when it gets implemented.
-            for arg_list in arg_lists:
-                chain = obj
-                for arg in arg_list:
-                    chain = getattr(chain, arg) if hasattr(chain, arg) else arg
-                    chain = chain() if callable(chain) else chain
-                args.append(chain)
-
-            return reverse(url.url, args=args)
+            return build_url(url, obj)
         except template.VariableDoesNotExist:
             return ""
 
@@ -0,0 +1,92 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.dispatch import Signal
+
+logger = logging.getLogger("sheepdog_tables")
+
+# Sent at the end of every timed phase of a table, with the view class as the
+# sender.  ``duration`` is in seconds; ``rows`` is None for phases that don't
+# handle rows.
+table_timed = Signal(providing_args=['namespace', 'phase', 'duration',
+                                     'queries', 'rows'])
+
+
+class PhaseTimer(object):
+    """
+    Records the wall time, query count and row count of the phases of a
+    view's tables (building the queryset, filtering, sorting, annotating,
+    paginating, fetching, rendering and exporting), logs them on the
+    ``sheepdog_tables`` logger and sends ``table_timed`` for each.
+
+    Queries are counted on the default database through its debug cursor,
+    which is switched on for the length of a phase when it isn't already, and
+    the queries it logged dropped again afterwards, so the query log doesn't
+    grow outside of ``DEBUG``.
+    """
+    def __init__(self, sender, using=DEFAULT_DB_ALIAS):
+        self.sender = sender
+        self.using = using
+        self.records = []
+
+    def phase(self, namespace, phase):
+        return _Phase(self, namespace, phase)
+
+    def add(self, record):
+        self.records.append(record)
+        logger.info('table %(namespace)s %(phase)s: %(duration).4fs, '
+                    '%(queries)s queries, %(rows)s rows', record)
+        table_timed.send(sender=self.sender, **record)
+
+    def server_timing(self):
+        """
+        The records as a ``Server-Timing`` header value.
+        """
+        metrics = []
+        for r in self.records:
+            desc = '%s queries' % r['queries']
+            if r['rows'] is not None:
+                desc += ', %s rows' % r['rows']
+            metrics.append('%s.%s;dur=%.1f;desc="%s"' % (
+                r['namespace'], r['phase'], r['duration'] * 1000, desc))
+        return ', '.join(metrics)
+
+
+class _Phase(object):
+    def __init__(self, timer, namespace, phase):
+        self.timer = timer
+        self.record = {'namespace': namespace, 'phase': phase, 'rows': None}
+
+    def __enter__(self):
+        # the connection of the current thread, so workers count their own
+        self.connection = conn = connections[self.timer.using]
+        self.debug_cursor = conn.use_debug_cursor
+        self.logged = self.debug_cursor or (self.debug_cursor is None and
+                                            settings.DEBUG)
+        if not self.logged:
+            conn.use_debug_cursor = True
+        self.queries = len(conn.queries)
+        self.start = time.time()
+        return self.record
+
+    def __exit__(self, *exc_info):
+        record = self.record
+        record['duration'] = time.time() - self.start
+        conn = self.connection
+        record['queries'] = len(conn.queries) - self.queries
+        if not self.logged:
+            conn.use_debug_cursor = self.debug_cursor
+            del conn.queries[self.queries:]
+        self.timer.add(record)
+
+
+class _NullPhase(object):
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, *exc_info):
+        pass
+
+null_phase = _NullPhase()
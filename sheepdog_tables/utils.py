@@ -1,3 +1,18 @@
+import heapq
+from array import array
+
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import six
+from django.utils.encoding import force_text
+
+from .column import split_chain, compile_chain, _dict_lookup
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
 class MockQuerySet(object):
     """
     MockQuerySet makes a list of dictionaries look like a queryset, providing
@@ -5,7 +20,7 @@ class MockQuerySet(object):
 
     The idea here is that the get_table_qs method of TablesMixin should return
     one of these objects when you are using a dictionary based representation
-    of data.
+    of data.  See ColumnarQuerySet for tables that need sorting or filtering.
 
     :params
 
@@ -22,3 +37,287 @@ class MockQuerySet(object):
 
     def __getitem__(self, n):
         return self.dict_list[n]
+
+
+class ColumnarQuerySet(object):
+    """
+    In memory stand in for a queryset over a list of dictionaries, for use
+    with ``DictColumn`` tables, that can be sorted, filtered, counted and
+    sliced like a queryset, so it works with ``Table.sort``, the
+    ``NamespacedPaginator`` and CSV exports.
+
+    Rows are stored column by column rather than as a dict each.  Integer
+    and float columns are packed into NumPy arrays when NumPy is installed,
+    or ``array.array`` otherwise.  Sorting, filtering and slicing produce
+    views sharing that storage, and dicts are only built for the rows that
+    are actually read.  Ordering is applied lazily, so fetching one page of
+    a sorted set only partially sorts it.
+
+        ColumnarQuerySet(rows).filter(status='open',
+                                      created__gte=since).order_by('-total')
+
+    :params
+
+    dict_list -- an iterable of dictionaries, consumed once
+
+    use_numpy -- whether to pack numeric columns with NumPy, which defaults
+                 to whether it can be imported
+    """
+    def __init__(self, dict_list=(), use_numpy=None):
+        if use_numpy is None:
+            use_numpy = numpy is not None
+        elif use_numpy and numpy is None:
+            raise ImproperlyConfigured('use_numpy requires NumPy.')
+        self.store = _ColumnStore(dict_list, use_numpy)
+        self.positions = None
+        self.ordering = ()
+
+    @classmethod
+    def _view(cls, store, positions, ordering=()):
+        qs = cls.__new__(cls)
+        qs.store = store
+        qs.positions = positions
+        qs.ordering = tuple(ordering)
+        return qs
+
+    @property
+    def ordered(self):
+        return bool(self.ordering)
+
+    def all(self):
+        return self._view(self.store, self.positions, self.ordering)
+
+    def annotate(self, *args, **kwargs):
+        return self.all()
+
+    def order_by(self, *field_names):
+        return self._view(self.store, self.positions, field_names)
+
+    def filter(self, **kwargs):
+        return self._view(self.store, self._filtered(kwargs, True),
+                          self.ordering)
+
+    def exclude(self, **kwargs):
+        return self._view(self.store, self._filtered(kwargs, False),
+                          self.ordering)
+
+    def count(self):
+        if self.positions is None:
+            return self.store.length
+        return len(self.positions)
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        positions = self._ordered_positions()
+        for start in range(0, len(positions), 1000):
+            for row in self.store.rows(positions[start:start + 1000]):
+                yield row
+
+    def iterator(self):
+        return iter(self)
+
+    def __getitem__(self, n):
+        if isinstance(n, slice):
+            start, stop, step = n.indices(self.count())
+            positions = self._ordered_positions(stop)[start:stop:step]
+            return self._view(self.store, positions)
+        if n < 0:
+            n += self.count()
+        positions = self._ordered_positions(n + 1)
+        return self.store.rows(positions[n:n + 1])[0]
+
+    def _all_positions(self):
+        if self.positions is None:
+            return range(self.store.length)
+        return self.positions
+
+    def _filtered(self, lookups, keep):
+        positions = self._all_positions()
+        for key, value in lookups.items():
+            field, lookup = key, 'exact'
+            if '__' in key and key.rsplit('__', 1)[1] in _LOOKUPS:
+                field, lookup = key.rsplit('__', 1)
+            values = self.store.column(field)
+            positions = _match(values, positions, lookup, value, keep)
+        return positions
+
+    def _ordered_positions(self, limit=None):
+        """
+        The positions of the rows in order, or at least the first ``limit``
+        of them.  Small limits are served with a partial sort.
+        """
+        positions = self._all_positions()
+        if not self.ordering:
+            return positions
+
+        keys = [(self.store.column(f.lstrip('-')), f.startswith('-'))
+                for f in self.ordering]
+        if limit is not None and limit * 4 >= len(positions):
+            limit = None
+        return _sort(positions, keys, limit)
+
+
+class _ColumnStore(object):
+    """
+    The column oriented storage shared by a ColumnarQuerySet and its views.
+    """
+    def __init__(self, dict_list, use_numpy):
+        names, columns = [], {}
+        length = 0
+        for row in dict_list:
+            for name, value in row.items():
+                if name not in columns:
+                    names.append(name)
+                    columns[name] = [None] * length
+                columns[name].append(value)
+            length += 1
+            for name in names:
+                if len(columns[name]) < length:
+                    columns[name].append(None)
+
+        self.names = names
+        self.length = length
+        self.columns = dict((name, _pack(values, use_numpy))
+                            for name, values in columns.items())
+        self.use_numpy = use_numpy
+
+    def column(self, name):
+        """
+        The values of ``name`` for every row.  Names such as ``owner__name``
+        that aren't columns are followed into the dicts of their first part.
+        """
+        if name in self.columns:
+            return self.columns[name]
+
+        names = split_chain(name)
+        column = self.columns.get(names[0])
+        if column is None:
+            return [None] * self.length
+        resolve = compile_chain(names[1:], _dict_lookup)
+        values = [resolve(v) for v in column]
+        self.columns[name] = values
+        return values
+
+    def rows(self, positions):
+        names = self.names
+        gathered = [_gather(self.columns[name], positions) for name in names]
+        return [dict(zip(names, values)) for values in zip(*gathered)]
+
+
+def _pack(values, use_numpy):
+    kinds = set(type(v) for v in values)
+    if kinds and kinds <= set(six.integer_types):
+        typecode, dtype = 'l', 'int64'
+    elif kinds == set([float]):
+        typecode, dtype = 'd', 'float64'
+    else:
+        return values
+
+    try:
+        if use_numpy:
+            return numpy.array(values, dtype=dtype)
+        return array(typecode, values)
+    except OverflowError:
+        return values
+
+
+def _is_array(values):
+    return numpy is not None and isinstance(values, numpy.ndarray)
+
+
+def _gather(values, positions):
+    if _is_array(values):
+        return values[numpy.asarray(positions, dtype='int64')].tolist()
+    return [values[i] for i in positions]
+
+
+def _text(value):
+    return force_text(value) if value is not None else None
+
+
+_LOOKUPS = {
+    'exact': lambda v, x: v == x,
+    'iexact': lambda v, x: (v is not None and
+                            _text(v).lower() == _text(x).lower()),
+    'contains': lambda v, x: v is not None and _text(x) in _text(v),
+    'icontains': lambda v, x: (v is not None and
+                               _text(x).lower() in _text(v).lower()),
+    'startswith': lambda v, x: v is not None and _text(v).startswith(_text(x)),
+    'istartswith': lambda v, x: (
+        v is not None and _text(v).lower().startswith(_text(x).lower())),
+    'endswith': lambda v, x: v is not None and _text(v).endswith(_text(x)),
+    'in': lambda v, x: v in x,
+    'gt': lambda v, x: v is not None and v > x,
+    'gte': lambda v, x: v is not None and v >= x,
+    'lt': lambda v, x: v is not None and v < x,
+    'lte': lambda v, x: v is not None and v <= x,
+    'isnull': lambda v, x: (v is None) == bool(x),
+}
+
+_ARRAY_LOOKUPS = {
+    'exact': lambda a, x: a == x,
+    'gt': lambda a, x: a > x,
+    'gte': lambda a, x: a >= x,
+    'lt': lambda a, x: a < x,
+    'lte': lambda a, x: a <= x,
+    'in': lambda a, x: numpy.in1d(a, list(x)),
+}
+
+
+def _match(values, positions, lookup, value, keep):
+    if (_is_array(values) and lookup in _ARRAY_LOOKUPS and
+            isinstance(value, six.integer_types + (float,) if lookup != 'in'
+                       else (list, tuple, set))):
+        index = numpy.asarray(positions, dtype='int64')
+        mask = _ARRAY_LOOKUPS[lookup](values[index], value)
+        return index[mask if keep else ~mask].tolist()
+
+    test = _LOOKUPS[lookup]
+    return [i for i in positions if bool(test(values[i], value)) == keep]
+
+
+def _sort_key(value):
+    # None sorts first, without comparing it to other values
+    return (value is not None, value)
+
+
+def _sort(positions, keys, limit):
+    """
+    Order ``positions`` by ``keys``, a list of ``(values, descending)``
+    pairs, returning the first ``limit`` of them only when given.  Rows
+    that tie keep their original order, however much is sorted.
+    """
+    if all(_is_array(values) for values, _ in keys):
+        index = numpy.asarray(positions, dtype='int64')
+        columns = [-values[index] if desc else values[index]
+                   for values, desc in keys]
+        if limit is not None and len(keys) == 1:
+            # only sort the rows that can make the first ``limit``
+            column = columns[0]
+            kth = numpy.partition(column, limit - 1)[limit - 1]
+            candidates = numpy.nonzero(column <= kth)[0]
+            order = numpy.lexsort((candidates, column[candidates]))
+            return index[candidates[order][:limit]].tolist()
+        order = numpy.lexsort([numpy.arange(len(index))] + columns[::-1])
+        return index[order][:limit].tolist()
+
+    directions = set(desc for _, desc in keys)
+    if len(directions) == 1:
+        descending = directions.pop()
+        if len(keys) == 1:
+            values = keys[0][0]
+            key = lambda i: _sort_key(values[i])
+        else:
+            key = lambda i: tuple(_sort_key(v[i]) for v, _ in keys)
+        if limit is not None:
+            pick = heapq.nlargest if descending else heapq.nsmallest
+            return pick(limit, positions, key=key)
+        return sorted(positions, key=key, reverse=descending)
+
+    # mixed directions: stable sorts from the last key to the first
+    positions = list(positions)
+    for values, desc in reversed(keys):
+        positions.sort(key=lambda i: _sort_key(values[i]), reverse=desc)
+    return positions[:limit]
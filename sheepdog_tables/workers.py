@@ -0,0 +1,145 @@
+import atexit
+import logging
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+from multiprocessing import TimeoutError
+
+from django.db import connections
+
+logger = logging.getLogger("sheepdog_tables")
+
+_pools = {}
+_lock = threading.Lock()
+
+
+class TableTimeout(Exception):
+    pass
+
+
+def get_pool(size, name='tables'):
+    """
+    The process wide pool of ``size`` threads.  Pools are shared between
+    requests, so ``size`` bounds the queries run at once across the whole
+    process, not per view.  Pools of different ``name`` are kept apart, so
+    long running jobs don't hold up the pages.
+    """
+    key = (name, size)
+    with _lock:
+        if key not in _pools:
+            _pools[key] = ThreadPool(size)
+        return _pools[key]
+
+
+@atexit.register
+def _close_pools():
+    # stop the daemon threads before the interpreter tears down under them
+    with _lock:
+        for pool in _pools.values():
+            pool.terminate()
+        _pools.clear()
+
+
+def _run(func):
+    # Each worker thread gets its own connections, which are closed once the
+    # task is done rather than left open between requests.
+    try:
+        return func()
+    finally:
+        for conn in connections.all():
+            conn.close()
+
+
+def cancel_query(connection):
+    """
+    Interrupt the query running on ``connection`` from another thread,
+    where the driver allows it (``cancel`` on psycopg2, ``interrupt`` on
+    sqlite3).  Returns whether it could.
+    """
+    raw = connection.connection
+    for method in ('cancel', 'interrupt'):
+        if raw is not None and hasattr(raw, method):
+            try:
+                getattr(raw, method)()
+                return True
+            except Exception:
+                logger.exception('could not cancel the query on %s',
+                                 connection.alias)
+                return False
+    return False
+
+
+class _Task(object):
+    """
+    A task of ``run_all``, which can be cancelled once its caller has
+    stopped waiting for it, so it doesn't hold on to a thread of the
+    shared pool: a task still queued is skipped, and a running one has
+    its query interrupted.
+    """
+    def __init__(self, func):
+        self.func = func
+        self.cancelled = False
+        self.connections = None
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            if self.cancelled:
+                raise TableTimeout('cancelled before it started')
+            self.connections = connections.all()
+        try:
+            return self.func()
+        finally:
+            with self.lock:
+                self.connections = None
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            for conn in self.connections or ():
+                cancel_query(conn)
+
+
+def submit(func, workers, name='tables'):
+    """
+    Run ``func`` in the background on the pool of ``workers`` threads called
+    ``name``, without waiting for it.
+    """
+    return get_pool(workers, name).apply_async(_run, (func,))
+
+
+def run_all(tasks, workers, timeout=None):
+    """
+    Run the callables of the ``tasks`` dict on a pool of ``workers`` threads
+    and wait for them, at most ``timeout`` seconds in total.
+
+    Returns a ``(results, errors)`` tuple of dicts keyed like ``tasks``.  A
+    task that raised has its exception in ``errors``, and one still running
+    when the time is up has a ``TableTimeout`` there instead, and is
+    cancelled: it is dropped if it hasn't started, and otherwise its query
+    is interrupted where the database driver allows it (PostgreSQL and
+    SQLite).  On other backends it is left to finish in the background.
+    """
+    pool = get_pool(workers)
+    tasks = dict((key, _Task(func)) for key, func in tasks.items())
+    pending = dict((key, pool.apply_async(_run, (task,)))
+                   for key, task in tasks.items())
+    deadline = time.time() + timeout if timeout is not None else None
+
+    results, errors = {}, {}
+    for key, result in sorted(pending.items()):
+        wait = (max(deadline - time.time(), 0)
+                if deadline is not None else None)
+        try:
+            # get() without a timeout can't be interrupted, so wait long
+            # rather than forever.
+            results[key] = result.get(wait if wait is not None else 1e9)
+        except TimeoutError:
+            logger.warning('table %s timed out after %ss', key, timeout)
+            tasks[key].cancel()
+            errors[key] = TableTimeout('%s timed out after %ss'
+                                       % (key, timeout))
+        except Exception as e:
+            logger.exception('table %s failed', key)
+            errors[key] = e
+    return results, errors
@@ -0,0 +1,16 @@
+from django.db import models
+
+
+class Author(models.Model):
+    name = models.CharField(max_length=100)
+
+
+class Item(models.Model):
+    author = models.ForeignKey(Author, related_name='items')
+    title = models.CharField(max_length=200)
+    quantity = models.IntegerField(default=0)
+
+
+class ProxyItem(Item):
+    class Meta:
+        proxy = True
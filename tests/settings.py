@@ -0,0 +1,29 @@
+"""
+Settings for the test suite: an in-memory SQLite database holding the
+models of the ``tests`` app.  See runtests.py.
+"""
+SECRET_KEY = 'tests'
+USE_TZ = False
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+INSTALLED_APPS = [
+    'crispy_forms',
+    'sheepdog_tables',
+    'tests',
+]
+
+ROOT_URLCONF = 'tests.urls'
+
+TEMPLATE_CONTEXT_PROCESSORS = ['django.core.context_processors.request']
@@ -0,0 +1,101 @@
+from django import forms
+from django.db import connection
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.views.generic import ListView
+
+from sheepdog_tables import Column, EditTable, EditTablesMixin
+from sheepdog_tables.query import bulk_update
+
+from .models import Author, Item
+
+
+def data_queries(queries):
+    """
+    The SQL of the captured ``queries``, less transaction control.
+    """
+    control = ('BEGIN', 'SAVEPOINT', 'RELEASE SAVEPOINT', 'COMMIT')
+    statements = [q['sql'] for q in queries.captured_queries]
+    # SQLite's debug cursor logs queries as QUERY = u'...' - PARAMS = ...
+    statements = [sql.split("'", 1)[1] if sql.startswith('QUERY') else sql
+                  for sql in statements]
+    return [sql for sql in statements if not sql.startswith(control)]
+
+
+class ItemForm(forms.ModelForm):
+    class Meta:
+        model = Item
+        fields = ['title', 'quantity']
+
+
+class BulkTable(EditTable):
+    table_sequence = ['title', 'quantity']
+    table_page_limit = 100
+    table_form = ItemForm
+    table_bulk_save = True
+
+    title = Column(editable=True)
+    quantity = Column(editable=True)
+
+
+class BulkView(EditTablesMixin, ListView):
+    queryset = Item.objects.order_by('pk')
+    template_name = 'unused.html'
+    main_table = BulkTable()
+
+    def get_success_url(self):
+        return '/'
+
+
+class BulkSaveTest(TestCase):
+    def setUp(self):
+        author = Author.objects.create(name='Ann')
+        Item.objects.bulk_create([
+            Item(author=author, title='item %s' % i, quantity=i)
+            for i in range(100)])
+        self.items = list(Item.objects.order_by('pk'))
+
+    def post(self, rows):
+        data = {
+            'main_table-TOTAL_FORMS': str(len(rows)),
+            'main_table-INITIAL_FORMS': str(len(rows)),
+            'main_table-MAX_NUM_FORMS': '0',
+        }
+        for i, (pk, title, quantity) in enumerate(rows):
+            data['main_table-%s-id' % i] = str(pk)
+            data['main_table-%s-title' % i] = title
+            data['main_table-%s-quantity' % i] = str(quantity)
+        request = RequestFactory().post('/', data)
+        with CaptureQueriesContext(connection) as queries:
+            response = BulkView.as_view()(request)
+        return response, data_queries(queries)
+
+    def test_page_save_queries(self):
+        rows = [(item.pk, 'saved %s' % item.pk, item.quantity + 1)
+                for item in self.items]
+        response, queries = self.post(rows)
+        self.assertEqual(response.status_code, 302)
+        # the formset's select and a single UPDATE for all 100 rows
+        self.assertEqual(len(queries), 2)
+        self.assertTrue(queries[1].startswith('UPDATE'))
+        quantities = dict((item.pk, item.quantity) for item in self.items)
+        for item in Item.objects.all():
+            self.assertEqual(item.title, 'saved %s' % item.pk)
+            self.assertEqual(item.quantity, quantities[item.pk] + 1)
+
+    def test_unchanged_rows_skipped(self):
+        rows = [(item.pk, item.title, item.quantity) for item in self.items]
+        rows[3] = (rows[3][0], 'changed', rows[3][2])
+        self.post(rows)
+        self.assertEqual(Item.objects.get(pk=rows[3][0]).title, 'changed')
+        self.assertEqual(Item.objects.get(pk=rows[4][0]).title, 'item 4')
+
+    def test_batches(self):
+        for item in self.items:
+            item.quantity = 1000 + item.pk
+        with CaptureQueriesContext(connection) as queries:
+            bulk_update(Item, self.items, ['quantity'], batch_size=30)
+        self.assertEqual(len(data_queries(queries)), 4)
+        for item in Item.objects.all():
+            self.assertEqual(item.quantity, 1000 + item.pk)
@@ -0,0 +1,88 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.views.generic import ListView
+
+from sheepdog_tables import Column, Table, TablesMixin
+
+from .models import Author, Item, ProxyItem
+
+
+class CachedTable(Table):
+    table_sequence = ['title', 'author']
+    table_cache_timeout = 60
+
+    title = Column()
+    author = Column(accessor='author.name')
+
+
+class CachedView(TablesMixin, ListView):
+    queryset = Item.objects.order_by('pk')
+    template_name = 'unused.html'
+    main_table = CachedTable()
+
+
+class CacheInvalidationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = Author.objects.create(name='Ann')
+        for i in range(3):
+            Item.objects.create(author=self.author, title='item %s' % i)
+
+    def page(self):
+        """
+        The (query count, rows) of the cached table's first page.
+        """
+        request = RequestFactory().get('/')
+        response = CachedView.as_view()(request)
+        table = response.context_data['tables']['main_table']
+        with CaptureQueriesContext(connection) as queries:
+            rows = [(obj.title, obj.author.name)
+                    for obj in table['page_obj'].object_list]
+        return len(queries), rows
+
+    def assertFresh(self, rows):
+        queries, page = self.page()
+        self.assertNotEqual(queries, 0)
+        self.assertEqual(page, rows)
+
+    def test_cached(self):
+        self.page()
+        queries, rows = self.page()
+        self.assertEqual(queries, 0)
+        self.assertEqual(rows[0], ('item 0', 'Ann'))
+
+    def test_save(self):
+        self.page()
+        item = Item.objects.get(title='item 0')
+        item.title = 'changed'
+        item.save()
+        self.assertFresh([('changed', 'Ann'), ('item 1', 'Ann'),
+                          ('item 2', 'Ann')])
+
+    def test_delete(self):
+        self.page()
+        Item.objects.get(title='item 0').delete()
+        self.assertFresh([('item 1', 'Ann'), ('item 2', 'Ann')])
+
+    def test_proxy_save(self):
+        self.page()
+        item = ProxyItem.objects.get(title='item 0')
+        item.title = 'proxy'
+        item.save()
+        self.assertEqual(self.page()[1][0], ('proxy', 'Ann'))
+
+    def test_deferred_save(self):
+        self.page()
+        item = Item.objects.only('title').get(title='item 0')
+        item.title = 'deferred'
+        item.save()
+        self.assertEqual(self.page()[1][0], ('deferred', 'Ann'))
+
+    def test_related_save(self):
+        self.page()
+        self.author.name = 'Bea'
+        self.author.save()
+        self.assertEqual(self.page()[1][0], ('item 0', 'Bea'))
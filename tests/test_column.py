@@ -0,0 +1,35 @@
+from django.test import SimpleTestCase
+
+from sheepdog_tables import Column, DictColumn
+
+
+class Row(object):
+    amount = 0
+
+
+class Money(Column):
+    def csv_value(self, object):
+        return '$%s' % Column.value(self, object)
+
+
+class TypedMoney(Money):
+    def export_value(self, object):
+        return 'typed'
+
+
+class ExportValueTest(SimpleTestCase):
+    def test_raw_value(self):
+        col = Column(field='amount', default='-')
+        self.assertEqual(col.csv_value(Row()), '-')
+        self.assertEqual(col.export_value(Row()), 0)
+        self.assertEqual(DictColumn(field='amount').export_value(
+            {'amount': 0}), 0)
+
+    def test_csv_value_override(self):
+        row = Row()
+        row.amount = 5
+        self.assertEqual(Money(field='amount').export_value(row), '$5')
+
+    def test_export_value_override(self):
+        self.assertEqual(TypedMoney(field='amount').export_value(Row()),
+                         'typed')
@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.core.paginator import EmptyPage
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.views.generic import ListView
+
+from sheepdog_tables import Column, Table, TablesMixin
+from sheepdog_tables.paginator import CountlessPaginator
+
+from .models import Author, Item
+
+
+class ItemTable(Table):
+    table_sequence = ['title']
+    table_page_limit = 10
+
+    title = Column()
+
+
+class CachedCountTable(ItemTable):
+    table_count = 'cached'
+
+
+class CountlessTable(ItemTable):
+    table_count = 'countless'
+
+
+class ItemView(TablesMixin, ListView):
+    queryset = Item.objects.order_by('pk')
+    template_name = 'unused.html'
+    main_table = ItemTable()
+
+
+def get_page(table, page):
+    view = ItemView.as_view(main_table=table)
+    response = view(RequestFactory().get('/', {'main_table-page': page}))
+    return response.context_data['tables']['main_table']['page_obj']
+
+
+class PastTheEndTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = Author.objects.create(name='Ann')
+        Item.objects.bulk_create([Item(author=author, title='item %s' % i)
+                                  for i in range(45)])
+
+    def test_offset(self):
+        page = get_page(ItemTable(), 9)
+        self.assertEqual(page.number, 5)
+        self.assertEqual(len(page), 5)
+
+    def test_stale_count(self):
+        table = CachedCountTable()
+        self.assertEqual(get_page(table, 5).paginator.count, 45)
+        Item.objects.filter(pk__gt=15).delete()
+        # the cached count still says 45, so page 5 looks like it exists
+        page = get_page(table, 5)
+        self.assertEqual(page.number, 2)
+        self.assertEqual(len(page), 5)
+        self.assertEqual(page.paginator.count, 15)
+
+    def test_countless(self):
+        page = get_page(CountlessTable(), 9)
+        self.assertEqual(page.number, 5)
+        self.assertEqual([obj.title for obj in page.object_list],
+                         ['item %s' % i for i in range(40, 45)])
+        self.assertFalse(page.has_next())
+
+    def test_countless_list(self):
+        paginator = CountlessPaginator(range(45), 10)
+        page = paginator.page(3)
+        self.assertEqual(paginator.num_pages, 4)
+        self.assertTrue(page.has_next())
+        self.assertRaises(EmptyPage, paginator.page, 9)
+        self.assertEqual(paginator.num_pages, 5)